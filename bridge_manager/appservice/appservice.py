@@ -7,17 +7,20 @@
 # keeps track of registered bridges
 # create/remove bridges
 
-import json
+import asyncio
+import orjson
 
 from fastapi import Request, FastAPI, HTTPException
 from fastapi.responses import JSONResponse
 import uvicorn
 
-from .homeserver_service import HomeserverService
+from .homeserver_service import HomeserverService, LARGE_BODY_BYTES
+from .bridge_service import BridgeService
+from .common_handlers import room_mapping_queue
 from .bridge_resolver import BridgeNotFoundError
 from ..bridge_registry import BridgeRegistry
 from ..config import BridgeManagerConfig
-from .models import RequestContext
+from .models import RequestContext, request_log_queue
 
 
 app = FastAPI()
@@ -27,6 +30,44 @@ homeserver_service = HomeserverService(bridge_manager_config=config)
 bridge_registry = BridgeRegistry(bridge_manager_config=config)
 
 
+async def _log_response(request_ctx, response) -> None:
+    """
+    Record the final response against the request log entry, if one was created.
+    Parsing the body for the log can be slow for large responses, so those are logged
+    off the event loop. The DB write itself is queued on request_log_queue.
+    """
+    if not (request_ctx and request_ctx.request_id):
+        return
+
+    # streamed responses have no body to parse
+    body = getattr(response, "body", None)
+    if body is not None and len(body) > LARGE_BODY_BYTES:
+        await asyncio.to_thread(request_ctx.log_response, response)
+    else:
+        request_ctx.log_response(response)
+
+
+@app.on_event("startup")
+async def startup():
+    """
+    Start background writers for DB writes deferred off the request path
+    """
+    room_mapping_queue.start()
+    request_log_queue.start()
+
+
+@app.on_event("shutdown")
+async def shutdown():
+    """
+    Flush deferred DB writes and close the pooled HTTP clients shared by all
+    HomeserverService and BridgeService instances
+    """
+    await room_mapping_queue.stop()
+    await request_log_queue.stop()
+    await HomeserverService.aclose_client()
+    await BridgeService.aclose_client()
+
+
 @app.api_route(
     "/homeserver/{path:path}",
     methods=["GET", "POST", "PUT", "DELETE", "PATCH", "OPTIONS", "HEAD"],
@@ -48,8 +89,7 @@ async def homeserver_catchall(path, request: Request):
         response = await homeserver_service.handle_request(request_ctx)
 
         # Log the response
-        if request_ctx and request_ctx.request_id:
-            request_ctx.log_response(response)
+        await _log_response(request_ctx, response)
 
         return response
 
@@ -57,15 +97,16 @@ async def homeserver_catchall(path, request: Request):
         # Handle case where bridge cannot be identified
         # For transaction endpoints with no events, return empty success response
         if path.startswith("_matrix/app/v1/transactions/"):
-            body = await request.body()
-            body = json.loads(body.decode("utf-8"))
+            # RequestContext.create leaves the parsed body on request.state
+            body = getattr(request.state, "body_json", None)
+            if body is None:
+                body = orjson.loads(await request.body())
             events = body.get("events")
             if not events:
                 error_response = JSONResponse(content={}, status_code=200)
 
                 # Log the response if we have a request_ctx
-                if request_ctx and request_ctx.request_id:
-                    request_ctx.log_response(error_response)
+                await _log_response(request_ctx, error_response)
 
                 return error_response
 
@@ -73,8 +114,7 @@ async def homeserver_catchall(path, request: Request):
         error_response = JSONResponse(content={"error": str(e)}, status_code=404)
 
         # Log the error response if we have a request_ctx
-        if request_ctx and request_ctx.request_id:
-            request_ctx.log_response(error_response)
+        await _log_response(request_ctx, error_response)
 
         return error_response
 
@@ -84,8 +124,7 @@ async def homeserver_catchall(path, request: Request):
             content={"error": f"Internal error: {str(e)}"}, status_code=500
         )
 
-        if request_ctx and request_ctx.request_id:
-            request_ctx.log_response(error_response)
+        await _log_response(request_ctx, error_response)
 
         return error_response
 
@@ -111,8 +150,7 @@ async def bridge_catchall(path, request: Request):
         response = await request_ctx.bridge.handle_request(request_ctx)
 
         # Log the response
-        if request_ctx and request_ctx.request_id:
-            request_ctx.log_response(response)
+        await _log_response(request_ctx, response)
 
         return response
 
@@ -122,8 +160,7 @@ async def bridge_catchall(path, request: Request):
         )
 
         # Log the error response if we have a request_ctx
-        if request_ctx and request_ctx.request_id:
-            request_ctx.log_response(error_response)
+        await _log_response(request_ctx, error_response)
 
         return error_response
 
@@ -133,8 +170,7 @@ async def bridge_catchall(path, request: Request):
             content={"error": f"Internal error: {str(e)}"}, status_code=500
         )
 
-        if request_ctx and request_ctx.request_id:
-            request_ctx.log_response(error_response)
+        await _log_response(request_ctx, error_response)
 
         return error_response
 
@@ -9,12 +9,15 @@ from __future__ import annotations
 import re
 import json
 import time
-from typing import TYPE_CHECKING, Optional, Dict, Any
+from typing import TYPE_CHECKING, Optional, Dict, Any, Tuple, Union
 from enum import Enum
 
 from ..config import BridgeManagerConfig
 from ..bridge_registry import BridgeRegistry
-from ..database.repositories import TransactionMappingsRepository
+from ..database.repositories import (
+    RoomBridgeMappingRepository,
+    TransactionMappingsRepository,
+)
 from logger import Logger
 
 if TYPE_CHECKING:
@@ -23,6 +26,14 @@ if TYPE_CHECKING:
 
 logger = Logger().get_logger(__name__)
 
+# Repositories hold no per-request state (each call opens its own session), so share one of each
+_room_bridge_repo = RoomBridgeMappingRepository()
+_transaction_mappings_repo = TransactionMappingsRepository()
+
+# Patterns that don't depend on the config, compiled once
+_TXN_PATH_RE = re.compile(r"_matrix/app/v1/transactions/(?P<txn_id>\w+)")
+_OWNER_USERNAME_RE = re.compile(r"@(?P<username>[^:]+):(?P<homeserver>[^\s/]+)")
+
 
 class BridgeResolutionMethod(Enum):
     """Tracks which method successfully resolved a bridge"""
@@ -79,6 +90,7 @@ class BridgeResolver:
         path: str,
         body_json: Optional[Dict[str, Any]] = None,
         query_params: Optional[Dict[str, Any]] = None,
+        path_match: Optional[re.Match] = None,
     ) -> tuple[Optional[BridgeService], BridgeResolutionMethod]:
         """
         Attempt to resolve a bridge using available strategies.
@@ -89,6 +101,8 @@ class BridgeResolver:
             path: Request path (may contain username)
             body_json: Request body (may contain username or transaction ID)
             query_params: Query parameters (may contain user_id for AS impersonation)
+            path_match: username_in_path_re matched against path by the caller, which
+                keeps it for handlers that need the username (e.g. users)
 
         Returns:
             Tuple of (bridge_service, resolution_method)
@@ -108,7 +122,9 @@ class BridgeResolver:
             logger.debug(f"Trying resolver: {resolver_name}")
             resolver_start = time.time()
             try:
-                bridge = resolver(source, headers, path, body_json, query_params)
+                bridge = resolver(
+                    source, headers, path, body_json, query_params, path_match
+                )
                 if bridge:
                     method = self._get_method_name(resolver)
                     elapsed = (time.time() - start_time) * 1000  # ms
@@ -143,6 +159,7 @@ class BridgeResolver:
         path: str,
         body_json: Optional[Dict[str, Any]],
         query_params: Optional[Dict[str, Any]] = None,
+        path_match: Optional[re.Match] = None,
     ) -> Optional[BridgeService]:
         """
         Resolve bridge from Authorization header token.
@@ -175,6 +192,7 @@ class BridgeResolver:
         path: str,
         body_json: Optional[Dict[str, Any]],
         query_params: Optional[Dict[str, Any]] = None,
+        path_match: Optional[re.Match] = None,
     ) -> Optional[BridgeService]:
         """
         Resolve bridge from user_id query parameter.
@@ -192,12 +210,12 @@ class BridgeResolver:
             return None
 
         # Check if user_id matches the namespace pattern
-        username_pattern = self.config.username_regex
-        match = re.match(username_pattern, user_id)
+        username_re = self.config.username_re
+        match = username_re.match(user_id)
 
         if not match:
             logger.debug(f"user_id query param doesn't match pattern: {user_id}")
-            logger.debug(f"Expected pattern: {username_pattern}")
+            logger.debug(f"Expected pattern: {username_re.pattern}")
             return None
 
         try:
@@ -223,6 +241,7 @@ class BridgeResolver:
         path: str,
         body_json: Optional[Dict[str, Any]],
         query_params: Optional[Dict[str, Any]] = None,
+        path_match: Optional[re.Match] = None,
     ) -> Optional[BridgeService]:
         """
         Resolve bridge from encoded username in request path.
@@ -236,9 +255,7 @@ class BridgeResolver:
         if source != RequestSource.HOMESERVER:
             return None
 
-        username_pattern = rf".*/{self.config.username_regex}"
-        match = re.match(username_pattern, path)
-
+        match = path_match
         if not match:
             logger.debug("No encoded username found in path")
             return None
@@ -261,6 +278,7 @@ class BridgeResolver:
         path: str,
         body_json: Optional[Dict[str, Any]],
         query_params: Optional[Dict[str, Any]] = None,
+        path_match: Optional[re.Match] = None,
     ) -> Optional[BridgeService]:
         """
         Resolve bridge from transaction ID mapping.
@@ -275,7 +293,7 @@ class BridgeResolver:
             return None
 
         # Try finding transaction ID in path (e.g., /_matrix/app/v1/transactions/123)
-        txn_id_match = re.match(r"_matrix/app/v1/transactions/(?P<txn_id>\w+)", path)
+        txn_id_match = _TXN_PATH_RE.match(path)
         txn_id_from_path = txn_id_match.group("txn_id") if txn_id_match else None
 
         # Try finding transaction ID in body
@@ -288,8 +306,9 @@ class BridgeResolver:
             return None
 
         try:
-            transactions_repo = TransactionMappingsRepository()
-            mapping = transactions_repo.get_bridge_by_transaction(transaction_id=txn_id)
+            mapping = _transaction_mappings_repo.get_bridge_by_transaction(
+                transaction_id=txn_id
+            )
 
             if not mapping or not mapping.bridge_as_token:
                 logger.debug(f"No bridge mapping found for transaction_id: {txn_id}")
@@ -308,6 +327,7 @@ class BridgeResolver:
         path: str,
         body_json: Optional[Dict[str, Any]],
         query_params: Optional[Dict[str, Any]] = None,
+        path_match: Optional[re.Match] = None,
     ) -> Optional[BridgeService]:
         """
         Resolve bridge from transaction events by extracting bridge usernames.
@@ -460,8 +480,7 @@ class BridgeResolver:
 
         try:
             # Extract orchestrator_id from encoded username
-            username_pattern = self.config.username_regex
-            match = re.match(username_pattern, username)
+            match = self.config.username_re.match(username)
             if not match:
                 logger.debug(f"Username doesn't match expected pattern: {username}")
                 return None
@@ -482,6 +501,7 @@ class BridgeResolver:
         path: str,
         body_json: Optional[Dict[str, Any]],
         query_params: Optional[Dict[str, Any]] = None,
+        path_match: Optional[re.Match] = None,
     ) -> Optional[BridgeService]:
         """
         Resolve bridge from room_id in transaction events.
@@ -493,7 +513,6 @@ class BridgeResolver:
         This is useful for messages sent by regular users (not bridge users)
         in bridged rooms, where the only identifier is the room_id.
         """
-        from ..database.repositories import RoomBridgeMappingRepository
         from .models import RequestSource
 
         # Only applicable for homeserver-originated requests
@@ -523,9 +542,8 @@ class BridgeResolver:
             return None
 
         # Try to find a bridge mapping for any of the room_ids
-        room_bridge_repo = RoomBridgeMappingRepository()
         for room_id in room_ids:
-            bridge_id = room_bridge_repo.get_bridge_by_room_id(room_id)
+            bridge_id = _room_bridge_repo.get_bridge_by_room_id(room_id)
             if bridge_id:
                 logger.info(
                     f"Resolved bridge from room_id mapping: room={room_id}, bridge_id={bridge_id}"
@@ -550,7 +568,7 @@ class BridgeResolver:
         self, content: Dict[str, Any], namespace_prefix: str, context: str = ""
     ) -> set:
         """
-        Recursively extract bridge usernames from event content.
+        Extract bridge usernames from event content, including nested objects.
 
         Handles various content structures:
         - Direct user_id fields
@@ -569,69 +587,82 @@ class BridgeResolver:
         usernames = set()
 
         # Common fields that might contain usernames
-        direct_fields = ["user_id", "sender", "creator", "target", "kick", "ban"]
-
-        for field in direct_fields:
-            if field in content and isinstance(content[field], str):
-                if content[field].startswith(namespace_prefix):
-                    usernames.add(content[field])
+        direct_fields = ("user_id", "sender", "creator", "target", "kick", "ban")
+        # Extract usernames from HTML mentions: <a href="https://matrix.to/#/@user:server">
+        mention_re = re.compile(rf"https://matrix\.to/#/({namespace_prefix}[^\"'>]+)")
+
+        # Nested dictionaries are walked with an explicit stack rather than recursion
+        stack = [(content, context)]
+        while stack:
+            content, context = stack.pop()
+
+            for field in direct_fields:
+                value = content.get(field)
+                if isinstance(value, str) and value.startswith(namespace_prefix):
+                    usernames.add(value)
                     logger.debug(
-                        f"Found bridge username in content.{field} ({context}): {content[field]}"
+                        "Found bridge username in content.%s (%s): %s",
+                        field,
+                        context,
+                        value,
                     )
 
-        # Check for mentions in formatted_body (HTML content)
-        formatted_body = content.get("formatted_body", "")
-        if formatted_body and isinstance(formatted_body, str):
-            # Extract usernames from HTML mentions: <a href="https://matrix.to/#/@user:server">
-            mention_pattern = rf"https://matrix\.to/#/({namespace_prefix}[^\"'>]+)"
-            mentions = re.findall(mention_pattern, formatted_body)
-            for mention in mentions:
-                usernames.add(mention)
-                logger.debug(
-                    f"Found bridge username in formatted_body mention ({context}): {mention}"
-                )
-
-        # Check for reply/thread references (m.relates_to)
-        relates_to = content.get("m.relates_to", {})
-        if relates_to and isinstance(relates_to, dict):
-            # Check in_reply_to
-            in_reply_to = relates_to.get("m.in_reply_to", {})
-            if in_reply_to:
-                reply_sender = in_reply_to.get("sender", "")
-                if reply_sender.startswith(namespace_prefix):
-                    usernames.add(reply_sender)
+            # Check for mentions in formatted_body (HTML content)
+            formatted_body = content.get("formatted_body", "")
+            if formatted_body and isinstance(formatted_body, str):
+                for mention in mention_re.findall(formatted_body):
+                    usernames.add(mention)
                     logger.debug(
-                        f"Found bridge username in reply reference ({context}): {reply_sender}"
+                        "Found bridge username in formatted_body mention (%s): %s",
+                        context,
+                        mention,
                     )
 
-        # Recursively search nested dictionaries and lists
-        for key, value in content.items():
-            if isinstance(value, dict):
-                nested_usernames = self._extract_usernames_from_content(
-                    value, namespace_prefix, f"{context}.{key}" if context else key
-                )
-                usernames.update(nested_usernames)
-            elif isinstance(value, list):
-                for item in value:
-                    if isinstance(item, dict):
-                        nested_usernames = self._extract_usernames_from_content(
-                            item,
-                            namespace_prefix,
-                            f"{context}.{key}[]" if context else f"{key}[]",
+            # Check for reply/thread references (m.relates_to)
+            relates_to = content.get("m.relates_to", {})
+            if relates_to and isinstance(relates_to, dict):
+                # Check in_reply_to
+                in_reply_to = relates_to.get("m.in_reply_to", {})
+                if in_reply_to:
+                    reply_sender = in_reply_to.get("sender", "")
+                    if reply_sender.startswith(namespace_prefix):
+                        usernames.add(reply_sender)
+                        logger.debug(
+                            "Found bridge username in reply reference (%s): %s",
+                            context,
+                            reply_sender,
                         )
-                        usernames.update(nested_usernames)
-                    elif isinstance(item, str) and item.startswith(namespace_prefix):
-                        usernames.add(item)
+
+            # Queue nested dictionaries, and pick up username strings on the way
+            for key, value in content.items():
+                if isinstance(value, dict):
+                    stack.append((value, f"{context}.{key}" if context else key))
+                elif isinstance(value, list):
+                    for item in value:
+                        if isinstance(item, dict):
+                            stack.append(
+                                (item, f"{context}.{key}[]" if context else f"{key}[]")
+                            )
+                        elif isinstance(item, str) and item.startswith(
+                            namespace_prefix
+                        ):
+                            usernames.add(item)
+                            logger.debug(
+                                "Found bridge username in content list (%s.%s): %s",
+                                context,
+                                key,
+                                item,
+                            )
+                elif isinstance(value, str) and value.startswith(namespace_prefix):
+                    # Catch any string field we haven't explicitly checked
+                    if key not in direct_fields:  # Don't double-log
+                        usernames.add(value)
                         logger.debug(
-                            f"Found bridge username in content list ({context}.{key}): {item}"
+                            "Found bridge username in content.%s (%s): %s",
+                            key,
+                            context,
+                            value,
                         )
-            elif isinstance(value, str) and value.startswith(namespace_prefix):
-                # Catch any string field we haven't explicitly checked
-                if key not in direct_fields:  # Don't double-log
-                    usernames.add(value)
-                    logger.debug(
-                        f"Found bridge username in content.{key} ({context}): {value}"
-                    )
 
         return usernames
 
@@ -642,6 +673,7 @@ class BridgeResolver:
         path: str,
         body_json: Optional[Dict[str, Any]],
         query_params: Optional[Dict[str, Any]] = None,
+        path_match: Optional[re.Match] = None,
     ) -> Optional[BridgeService]:
         """
         Resolve bridge from encoded username found anywhere in request body.
@@ -659,15 +691,17 @@ class BridgeResolver:
             return None
 
         # Search for encoded username pattern in body
-        username_pattern = self.config.username_regex
-        encoded_username = self._find_pattern_in_json(body_json, username_pattern)
+        username_re = self.config.username_re
+        encoded_username = self._find_pattern_in_json(
+            body_json, username_re, prefix=f"@{self.config.NAMESPACE}"
+        )
 
         if not encoded_username:
             logger.debug("No encoded username found in body")
             return None
 
         try:
-            match = re.match(username_pattern, encoded_username)
+            match = username_re.match(encoded_username)
             if not match:
                 return None
 
@@ -688,6 +722,7 @@ class BridgeResolver:
         path: str,
         body_json: Optional[Dict[str, Any]],
         query_params: Optional[Dict[str, Any]] = None,
+        path_match: Optional[re.Match] = None,
     ) -> Optional[BridgeService]:
         """
         Resolve bridge from owner's plain username + bridge type in body.
@@ -707,23 +742,24 @@ class BridgeResolver:
         if not body_json:
             return None
 
-        # Look for plain username pattern
-        owner_pattern = r"@(?P<username>[^:]+):(?P<homeserver>[^\s/]+)"
-        owner_username = self._find_pattern_in_json(body_json, owner_pattern)
-
-        # Look for encoded username to extract bridge type
-        bridge_pattern = self.config.username_regex
-        bridge_username = self._find_pattern_in_json(body_json, bridge_pattern)
+        # One walk finds both the plain username (owner) and an encoded username
+        # (for the bridge type), and stops as soon as it has both
+        found = self._find_patterns_in_json(
+            body_json,
+            {
+                "owner": (_OWNER_USERNAME_RE, "@"),
+                "bridge": (self.config.username_re, f"@{self.config.NAMESPACE}"),
+            },
+        )
+        owner_match = found.get("owner")
+        match = found.get("bridge")
 
-        if not owner_username or not bridge_username:
+        if not owner_match or not match:
             logger.debug("Missing owner username or bridge username in body")
             return None
 
         try:
-            match = re.match(bridge_pattern, bridge_username)
-            if not match:
-                return None
-
+            owner_username = owner_match.string
             service = match.group("bridge_type")
             bridge = self.registry.get_bridge(
                 owner_username=owner_username, service=service
@@ -746,33 +782,70 @@ class BridgeResolver:
         return auth.replace("Bearer ", "").strip()
 
     @staticmethod
-    def _find_pattern_in_json(obj: Any, pattern: str) -> Optional[str]:
+    def _find_pattern_in_json(
+        obj: Any, pattern: Union[str, re.Pattern], prefix: str = ""
+    ) -> Optional[str]:
         """
-        Recursively search JSON structure for string matching regex pattern.
+        Search a JSON structure, including nested objects, for a string matching
+        a regex pattern.
 
         Args:
             obj: JSON-serializable object (dict, list, str, etc.)
-            pattern: Regex pattern to match
+            pattern: Regex pattern to match, as a string or precompiled
+            prefix: Literal prefix every match starts with. Strings without it are
+                skipped with a startswith check instead of running the regex.
 
         Returns:
             First matching string found, or None
         """
-        if isinstance(obj, dict):
-            for value in obj.values():
-                if isinstance(value, str) and re.match(pattern, value):
-                    return value
-                result = BridgeResolver._find_pattern_in_json(value, pattern)
-                if result:
-                    return result
-        elif isinstance(obj, list):
-            for item in obj:
-                result = BridgeResolver._find_pattern_in_json(item, pattern)
-                if result:
-                    return result
-        elif isinstance(obj, str) and re.match(pattern, obj):
-            return obj
+        match = BridgeResolver._find_patterns_in_json(
+            obj, {"match": (pattern, prefix)}
+        ).get("match")
+        return match.string if match else None
 
-        return None
+    @staticmethod
+    def _find_patterns_in_json(
+        obj: Any, patterns: Dict[str, Tuple[Union[str, re.Pattern], str]]
+    ) -> Dict[str, re.Match]:
+        """
+        Search a JSON structure once for several patterns, stopping as soon as
+        every pattern has matched.
+
+        Args:
+            obj: JSON-serializable object (dict, list, str, etc.)
+            patterns: name -> (pattern, prefix), as for _find_pattern_in_json
+
+        Returns:
+            name -> match for the first matching string of each pattern found
+        """
+        remaining = {
+            name: (re.compile(pattern), prefix)
+            for name, (pattern, prefix) in patterns.items()
+        }
+        found = {}
+
+        # Depth-first with an explicit stack, children are pushed in reverse so
+        # strings are checked in the same order as a recursive walk would
+        stack = [obj]
+        while stack:
+            node = stack.pop()
+            if isinstance(node, str):
+                hit = False
+                for name, (pattern, prefix) in remaining.items():
+                    if node.startswith(prefix) and (match := pattern.match(node)):
+                        found[name] = match
+                        hit = True
+                if hit:
+                    for name in found:
+                        remaining.pop(name, None)
+                    if not remaining:
+                        break
+            elif isinstance(node, dict):
+                stack.extend(reversed(node.values()))
+            elif isinstance(node, list):
+                stack.extend(reversed(node))
+
+        return found
 
     @staticmethod
     def _get_method_name(resolver_func) -> BridgeResolutionMethod:
@@ -1,9 +1,11 @@
 from __future__ import annotations
 from abc import ABC, abstractmethod
+from functools import partial
+import asyncio
 import re
-import json
 import httpx
-from typing import TYPE_CHECKING
+import orjson
+from typing import TYPE_CHECKING, Mapping, Optional
 
 from fastapi import Request, Response
 from fastapi.responses import JSONResponse
@@ -15,7 +17,13 @@ from ..database.repositories import (
     HomeserversRepository,
 )
 from .route_registry import RouteRegistry, RouteNotFoundError
-from .common_handlers import MatrixClientAPIHandlers, AppserviceAPIHandlers
+from .common_handlers import (
+    MatrixClientAPIHandlers,
+    AppserviceAPIHandlers,
+    body_kwargs,
+    prep_headers,
+    replace_appservice_id,
+)
 from logger import Logger
 
 if TYPE_CHECKING:
@@ -23,12 +31,21 @@ if TYPE_CHECKING:
 
 logger = Logger().get_logger(__name__)
 
+# Repositories hold no per-request state (each call opens its own session), so share one
+_transaction_mappings_repo = TransactionMappingsRepository()
+
 # the homeserver needs to create a user for each specific service
 # the username will have to be part of the namespace i.e. _bridge_manager__whatsapp_1__
 
 
 class BridgeService(ABC):
 
+    bridge_id: int
+
+    # Shared by every bridge service so connections to the bridges are pooled and reused.
+    # httpx keeps a separate pool per bridge host, so one client serves all of them.
+    _client: Optional[httpx.AsyncClient] = None
+
     def __init__(
         self,
         as_token: str,
@@ -36,7 +53,6 @@ class BridgeService(ABC):
     ):
 
         from .homeserver_service import HomeserverService
-        from ..bridge_registry import BridgeRegistry
 
         self.bridge_manager_config = bridge_manager_config
         self.homeserver = HomeserverService(bridge_manager_config=bridge_manager_config)
@@ -55,47 +71,90 @@ class BridgeService(ABC):
         self.bridge_id = bridge.id
         self.bridge_url = f"http://{bridge.ip}:{bridge.port}"
 
+        # Creates the username for the bot like @_bridge_manager__whatsapp_1:matrix.localhost.me
+        # Built once since it is fixed for the lifetime of the bridge instance
+        self.username = f"@{bridge_manager_config.NAMESPACE}{self.bridge_type}_{self.bridge_id}:{self.homeserver_name}"
+
         # Initialize route registry
         self.routes = RouteRegistry(fallback_handler=self.unhandled_endpoint)
         self.register_routes()
 
+    @classmethod
+    def get_client(cls) -> httpx.AsyncClient:
+        """
+        Returns the shared HTTP client, creating it on first use. Stored on
+        BridgeService itself so subclasses don't each end up with their own.
+        """
+        if BridgeService._client is None or BridgeService._client.is_closed:
+            BridgeService._client = httpx.AsyncClient(
+                limits=httpx.Limits(
+                    max_connections=200,
+                    max_keepalive_connections=100,
+                    keepalive_expiry=60.0,
+                ),
+            )
+        return BridgeService._client
+
+    @classmethod
+    async def aclose_client(cls) -> None:
+        """
+        Closes the shared HTTP client. Called on application shutdown.
+        """
+        if BridgeService._client is not None:
+            await BridgeService._client.aclose()
+            BridgeService._client = None
+
     async def send_request(
         self,
         request_ctx,
         method,
         path,
         query_params=None,
-        headers=None,
+        headers: Optional[Mapping[str, str]] = None,
         content=None,
         data=None,
         json=None,
     ) -> Response:
 
+        # read-only handlers may pass the request's Headers straight through
+        if not isinstance(headers, dict):
+            headers = dict(headers or {})
         headers["authorization"] = f"Bearer {request_ctx.homeserver.hs_token}"
 
         url = f"{self.bridge_url}/{path}"
 
-        async with httpx.AsyncClient() as client:
+        if json is not None:
+            # serialized with orjson rather than httpx's stdlib json encoding
+            content = orjson.dumps(json)
+            headers.setdefault("content-type", "application/json")
 
-            request = client.build_request(
-                method=method,
-                url=url,
-                params=query_params,
-                headers=headers,
-                content=content,
-                json=json,
-                data=data,
-            )
+        client = self.get_client()
+
+        request = client.build_request(
+            method=method,
+            url=url,
+            params=query_params,
+            headers=headers,
+            content=content,
+            data=data,
+        )
 
-            # log the outgoing request
-            request_ctx.log_outbound_request(request)
+        # log the outgoing request
+        request_ctx.log_outbound_request(request)
 
-            response = await client.send(request)
+        response = await client.send(request)
 
-            # log response
-            request_ctx.log_response(response)
+        # log response
+        request_ctx.log_response(response)
 
-        return JSONResponse(content=response.json(), status_code=response.status_code)
+        # the bridge's body is already serialized, pass the bytes through with its
+        # content type rather than parsing and re-serializing them. httpx has already
+        # decoded any content-encoding, so that header isn't carried over
+        return Response(
+            content=response.content,
+            status_code=response.status_code,
+            media_type=response.headers.get("content-type", "application/json"),
+        )
 
     @abstractmethod
     def register_routes(self) -> None:
@@ -120,8 +179,8 @@ class BridgeService(ABC):
         Raises:
             RouteNotFoundError: If no route matches and no fallback is set
         """
-        path = request_ctx.request.path_params.get("path")
-        logger.info(f"Handling {self.bridge_type} bridge request to {path}")
+        path = request_ctx.path
+        logger.info("Handling %s bridge request to %s", self.bridge_type, path)
 
         try:
             handler = self.routes.match_or_fallback(path)
@@ -138,7 +197,7 @@ class BridgeService(ABC):
 
         Can be overridden by subclasses to provide custom behavior.
         """
-        path = request_ctx.request.path_params.get("path")
+        path = request_ctx.path
         logger.warning(f"Unhandled endpoint for {self.bridge_type}: {path}")
         return JSONResponse(
             content={
@@ -149,13 +208,6 @@ class BridgeService(ABC):
             status_code=501,
         )
 
-    @property
-    def username(self):
-        """
-        Creates the username for the bot like @_bridge_manager__whatsapp_1:matrix.localhost.me
-        """
-        return f"@{self.bridge_manager_config.NAMESPACE}{self.bridge_type}_{self.bridge_id}:{self.homeserver_name}"
-
     @staticmethod
     async def extract_request_details(request: Request) -> dict:
         """
@@ -181,10 +233,13 @@ class BridgeService(ABC):
                 if request_ctx.query_params is not None
                 else dict(request.query_params)
             )
+        elif hasattr(request.state, "body_json"):
+            # parsed already by RequestContext.create
+            body = request.state.body_json
         else:
             body = await request.body()
             try:
-                body = json.loads(body)
+                body = orjson.loads(body)
             except Exception:
                 body = None
 
@@ -210,12 +265,19 @@ class WhatsappBridgeService(BridgeService):
 
     def register_routes(self) -> None:
         """Register WhatsApp-specific Matrix Client API endpoints"""
-        # Use common handlers for standard endpoints
+        # Use common handlers for standard endpoints. Each is bound to the
+        # homeserver with partial here, so dispatch doesn't go through a lambda
+        # that looks the handler up on the class on every request.
         self.routes.add_exact(
             "_matrix/client/versions",
-            lambda ctx: MatrixClientAPIHandlers.versions(ctx, self.homeserver),
+            partial(MatrixClientAPIHandlers.versions, homeserver=self.homeserver),
             "Matrix client API versions",
         )
+        self.routes.add_exact(
+            "_bridge_manager/batch",
+            partial(MatrixClientAPIHandlers.batch, homeserver=self.homeserver),
+            "Batch of Client API requests forwarded concurrently",
+        )
         self.routes.add_exact(
             "_matrix/client/v3/account/whoami",
             self.whoami,  # Keep custom implementation for username translation
@@ -223,15 +285,20 @@ class WhatsappBridgeService(BridgeService):
         )
         self.routes.add_exact(
             "_matrix/client/v1/media/config",
-            lambda ctx: MatrixClientAPIHandlers.media_config(ctx, self.homeserver),
+            partial(MatrixClientAPIHandlers.media_config, homeserver=self.homeserver),
             "Media configuration",
         )
         self.routes.add_exact(
             "_matrix/client/v3/register",
-            lambda ctx: MatrixClientAPIHandlers.register(ctx, self.homeserver),
+            partial(MatrixClientAPIHandlers.register, homeserver=self.homeserver),
             "User registration",
         )
 
+        # Profile paths only differ by the trailing field, build the prefix once
+        profile_prefix = (
+            rf"_matrix/client/v3/profile/@[^:]+:{re.escape(self.homeserver_name)}"
+        )
+
         # Regex patterns for dynamic paths
         self.routes.add_regex(
             r"_matrix/client/v1/appservice/\w+/ping",
@@ -239,103 +306,93 @@ class WhatsappBridgeService(BridgeService):
             "Appservice ping",
         )
         self.routes.add_regex(
-            rf"_matrix/client/v3/profile/@[^:]+:{re.escape(self.homeserver_name)}/avatar_url",
-            lambda ctx: MatrixClientAPIHandlers.profile_avatar_url(
-                ctx, self.homeserver
+            f"{profile_prefix}/avatar_url",
+            partial(
+                MatrixClientAPIHandlers.profile_avatar_url, homeserver=self.homeserver
             ),
             "User avatar URL",
         )
         self.routes.add_regex(
-            rf"_matrix/client/v3/profile/@[^:]+:{re.escape(self.homeserver_name)}/displayname",
-            lambda ctx: MatrixClientAPIHandlers.profile_displayname(
-                ctx, self.homeserver
+            f"{profile_prefix}/displayname",
+            partial(
+                MatrixClientAPIHandlers.profile_displayname, homeserver=self.homeserver
             ),
             "User display name",
         )
         self.routes.add_regex(
-            rf"_matrix/client/v3/profile/@[^:]+:{re.escape(self.homeserver_name)}$",
-            lambda ctx: MatrixClientAPIHandlers.profile(ctx, self.homeserver),
+            f"{profile_prefix}$",
+            partial(MatrixClientAPIHandlers.profile, homeserver=self.homeserver),
             "User full profile",
         )
 
         # Media endpoints
         self.routes.add_regex(
             r"^_matrix/client/v1/media/download/[^/]+/.+",
-            lambda ctx: MatrixClientAPIHandlers.media_download(ctx, self.homeserver),
+            partial(MatrixClientAPIHandlers.media_download, homeserver=self.homeserver),
             "Media download endpoint",
         )
         self.routes.add_exact(
             "_matrix/client/v1/media/upload",
-            lambda ctx: MatrixClientAPIHandlers.media_upload(ctx, self.homeserver),
+            partial(MatrixClientAPIHandlers.media_upload, homeserver=self.homeserver),
             "Media upload endpoint",
         )
 
         # Room membership endpoints
         self.routes.add_regex(
             r"_matrix/client/v3/rooms/[^/]+/join",
-            lambda ctx: MatrixClientAPIHandlers.room_join(ctx, self.homeserver),
+            partial(MatrixClientAPIHandlers.room_join, homeserver=self.homeserver),
             "Room join endpoint",
         )
 
         # Room state endpoints
         self.routes.add_regex(
             r"_matrix/client/v3/rooms/[^/]+/state$",
-            lambda ctx: MatrixClientAPIHandlers.room_state_all(ctx, self.homeserver),
+            partial(MatrixClientAPIHandlers.room_state_all, homeserver=self.homeserver),
             "Room state retrieval",
         )
         self.routes.add_regex(
             r"_matrix/client/v3/rooms/[^/]+/state/[^/]+(?:/.*)?$",
-            lambda ctx: MatrixClientAPIHandlers.room_state_event(ctx, self.homeserver),
+            partial(
+                MatrixClientAPIHandlers.room_state_event, homeserver=self.homeserver
+            ),
             "Get specific room state event",
         )
         self.routes.add_regex(
             r"_matrix/client/v3/rooms/[^/]+/members",
-            lambda ctx: MatrixClientAPIHandlers.room_members(ctx, self.homeserver),
+            partial(MatrixClientAPIHandlers.room_members, homeserver=self.homeserver),
             "Room members list",
         )
 
         # Room event sending endpoints
         self.routes.add_regex(
             r"_matrix/client/v3/rooms/[^/]+/send/[^/]+/.+",
-            lambda ctx: MatrixClientAPIHandlers.room_send_event(ctx, self.homeserver),
+            partial(
+                MatrixClientAPIHandlers.room_send_event, homeserver=self.homeserver
+            ),
             "Send room event (messages, reactions, etc.)",
         )
 
         # Room creation endpoint
         self.routes.add_exact(
             "_matrix/client/v3/createRoom",
-            lambda ctx: MatrixClientAPIHandlers.room_create(ctx, self.homeserver),
+            partial(MatrixClientAPIHandlers.room_create, homeserver=self.homeserver),
             "Create new room",
         )
 
         # Server capabilities endpoint
         self.routes.add_exact(
             "_matrix/client/v3/capabilities",
-            lambda ctx: MatrixClientAPIHandlers.capabilities(ctx, self.homeserver),
+            partial(MatrixClientAPIHandlers.capabilities, homeserver=self.homeserver),
             "Get server capabilities",
         )
 
         # Room invite endpoint
         self.routes.add_regex(
             r"_matrix/client/v3/rooms/[^/]+/invite$",
-            lambda ctx: MatrixClientAPIHandlers.room_invite(ctx, self.homeserver),
+            partial(MatrixClientAPIHandlers.room_invite, homeserver=self.homeserver),
             "Invite user to room",
         )
 
-        # Room join endpoint
-        self.routes.add_regex(
-            r"_matrix/client/v3/rooms/[^/]+/join$",
-            lambda ctx: MatrixClientAPIHandlers.room_join(ctx, self.homeserver),
-            "Join room",
-        )
-
-        # Room members endpoint
-        self.routes.add_regex(
-            r"_matrix/client/v3/rooms/[^/]+/members$",
-            lambda ctx: MatrixClientAPIHandlers.room_members(ctx, self.homeserver),
-            "Get room members",
-        )
-
     async def whoami(self, request_ctx: RequestContext) -> Response:
         """
         Bridge checking who it is on the homserver and making sure it's username matches with the homserver.
@@ -352,20 +409,16 @@ class WhatsappBridgeService(BridgeService):
         response = await self.homeserver.send_request(
             request_ctx=request_ctx,
             method=request_ctx.request.method,
-            path=request_ctx.request.path_params["path"],
-            headers=(
-                request_ctx.headers
-                if request_ctx and request_ctx.headers is not None
-                else dict(request_ctx.request.headers)
-            ),
+            path=request_ctx.path,
+            headers=prep_headers(request_ctx),
             query_params=request_ctx.query_params,
         )
-        response_body = json.loads(response.body)
-        return JSONResponse(content=response_body, status_code=response.status_code)
+        # returned as is, parsing and re-wrapping it in a JSONResponse changed nothing
+        return response
 
     async def ping(self, request_ctx: RequestContext) -> Response:
 
-        body_json = request_ctx.body_json if request_ctx else None
+        body_json = request_ctx.body_json
         if not body_json:
             raise ValueError("Missing or invalid JSON body")
 
@@ -373,23 +426,19 @@ class WhatsappBridgeService(BridgeService):
         if not transaction_id:
             raise ValueError("Transaction ID missing")
 
-        body = json.dumps(body_json)
-
         # Replace bridge-specific appservice ID with bridge_manager ID
-        path = request_ctx.request.path_params.get("path")
-        path = re.sub(
-            r"(_bridge_manager__)[^/]+", rf"{self.bridge_manager_config.ID}", path
-        )
-
-        headers = (
-            request_ctx.headers.copy()
-            if request_ctx and request_ctx.headers is not None
-            else dict(request_ctx.request.headers)
-        )
-        headers.pop("content-length", None)
-
-        TransactionMappingsRepository().upsert(
-            transaction_id, bridge_as_token=self.as_token, bridge_id=self.bridge_id
+        path = request_ctx.path
+        path = replace_appservice_id(path, self.bridge_manager_config.ID)
+
+        headers = prep_headers(request_ctx)
+
+        # the homeserver calls back with this transaction_id before it answers, so the
+        # mapping is written before forwarding (off the event loop, but awaited)
+        await asyncio.to_thread(
+            _transaction_mappings_repo.upsert,
+            transaction_id,
+            bridge_as_token=self.as_token,
+            bridge_id=self.bridge_id,
         )
 
         return await self.homeserver.send_request(
@@ -397,5 +446,5 @@ class WhatsappBridgeService(BridgeService):
             method=request_ctx.request.method,
             path=path,
             headers=headers,
-            data=body,
+            **body_kwargs(request_ctx, headers),
         )
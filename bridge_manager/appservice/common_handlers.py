@@ -2,411 +2,687 @@
 
 These handlers implement standard Matrix API endpoints that behave the same
 way for most bridges, reducing duplication when adding new bridge services.
+
+Every handler ends in HomeserverService.send_request, which uses a single pooled
+httpx.AsyncClient shared across the process (closed on app shutdown).
 """
 
 from __future__ import annotations
-from typing import TYPE_CHECKING
+from dataclasses import dataclass
+from typing import TYPE_CHECKING, Dict, List, Optional, Tuple
+import asyncio
+import logging
+import re
+import time
 import httpx
+import orjson
+from urllib.parse import parse_qsl
 
-from fastapi.responses import JSONResponse
+from fastapi.responses import JSONResponse, Response
 from logger import Logger
+from ..database.repositories import (
+    RoomBridgeMappingRepository,
+    TransactionMappingsRepository,
+)
+from .write_behind import WriteBehindQueue
 
 if TYPE_CHECKING:
     from .models import RequestContext
     from .homeserver_service import HomeserverService
-    from fastapi import Response
 
 logger = Logger().get_logger(__name__)
 
+# Repositories hold no per-request state (each call opens its own session), so share one of each
+_room_bridge_repo = RoomBridgeMappingRepository()
+_transaction_mappings_repo = TransactionMappingsRepository()
+
+_APPSERVICE_ID_TOKEN = "_bridge_manager__"
+
+# Headers that describe the inbound connection rather than the request (RFC 7230 hop-by-hop,
+# plus content-length and host which httpx recomputes for the upstream request)
+_HOP_BY_HOP = frozenset(
+    {
+        "content-length",
+        "connection",
+        "keep-alive",
+        "transfer-encoding",
+        "te",
+        "trailer",
+        "upgrade",
+        "host",
+    }
+)
+# The hop-by-hop headers still dropped when the body is forwarded unchanged
+_CONNECTION_HEADERS = _HOP_BY_HOP - {"content-length"}
+
+
+def replace_appservice_id(path: str, appservice_id: str) -> str:
+    """
+    Replace the bridge-specific appservice ID segment (_bridge_manager__...) in
+    `path` with `appservice_id`. Plain string scanning, no regex.
+    """
+    i = path.find(_APPSERVICE_ID_TOKEN)
+    if i == -1:
+        return path
+    j = path.find("/", i)
+    return path[:i] + appservice_id + (path[j:] if j != -1 else "")
+
 
-class MatrixClientAPIHandlers:
+def _segments_after(path: str, anchor: str) -> Optional[List[str]]:
     """
-    Reusable handlers for standard Matrix Client API endpoints.
+    Split a fixed-segment Matrix path and return the segments following `anchor`.
 
-    These are bridge-agnostic implementations that can be used by any
-    bridge service. Override specific handlers in bridge subclasses
-    if custom behavior is needed.
+    e.g. ("_matrix/client/v3/rooms/!a:hs/send/m.room.message/1", "rooms")
+        -> ["!a:hs", "send", "m.room.message", "1"]
+
+    Returns None if the anchor segment isn't in the path.
     """
+    parts = path.split("/")
+    try:
+        i = parts.index(anchor)
+    except ValueError:
+        return None
+    return parts[i + 1 :]
 
-    @staticmethod
-    async def versions(
-        request_ctx: RequestContext, homeserver: HomeserverService
-    ) -> Response:
-        """
-        Handle /_matrix/client/versions endpoint.
 
-        Returns Matrix protocol versions supported by the homeserver.
-        This is typically the first request bridges make.
-        """
-        return await homeserver.send_request(
-            request_ctx=request_ctx,
-            method=request_ctx.request.method,
-            path=request_ctx.request.path_params["path"],
-            headers=(
-                request_ctx.headers
-                if request_ctx and request_ctx.headers is not None
-                else dict(request_ctx.request.headers)
-            ),
-        )
+def prep_headers(request_ctx: RequestContext) -> dict:
+    """
+    Return a copy of the inbound headers for forwarding without the hop-by-hop
+    headers, so httpx recomputes them. Built in a single pass and matched
+    case-insensitively, since the context's headers may not come from Starlette's
+    lowercased Headers.
+    """
+    headers = request_ctx.headers
+    if headers is None:
+        headers = request_ctx.request.headers
+    return {k: v for k, v in headers.items() if k.lower() not in _HOP_BY_HOP}
 
-    @staticmethod
-    async def whoami(
-        request_ctx: RequestContext, homeserver: HomeserverService
-    ) -> Response:
-        """
-        Handle /_matrix/client/v3/account/whoami endpoint.
 
-        Bridges use this to verify their identity on the homeserver.
-        Returns the user_id of the authenticated user (the bridge bot).
-        """
-        response = await homeserver.send_request(
-            request_ctx=request_ctx,
-            method=request_ctx.request.method,
-            path=request_ctx.request.path_params["path"],
-            headers=(
-                request_ctx.headers
-                if request_ctx and request_ctx.headers is not None
-                else dict(request_ctx.request.headers)
-            ),
-            query_params=request_ctx.query_params,
-        )
-        return response
+def _passthrough_headers(request_ctx: RequestContext) -> dict:
+    """
+    Return the inbound headers for forwarding a request whose body is sent unchanged.
+    Like prep_headers, but content-length is kept.
+    """
+    headers = request_ctx.headers
+    if headers is None:
+        headers = request_ctx.request.headers
+    return {k: v for k, v in headers.items() if k.lower() not in _CONNECTION_HEADERS}
 
-    @staticmethod
-    async def media_config(
-        request_ctx: RequestContext, homeserver: HomeserverService
-    ) -> Response:
-        """
-        Handle /_matrix/client/v1/media/config endpoint.
 
-        Returns media repository configuration (upload limits, etc.).
-        """
-        return await homeserver.send_request(
-            request_ctx=request_ctx,
-            method=request_ctx.request.method,
-            path=request_ctx.request.path_params["path"],
-            headers=(
-                request_ctx.headers
-                if request_ctx and request_ctx.headers is not None
-                else dict(request_ctx.request.headers)
+def body_kwargs(request_ctx: RequestContext, headers) -> dict:
+    """
+    send_request kwargs that forward the inbound JSON body unchanged.
+
+    The raw bytes are sent as received rather than re-serializing body_json. When
+    there are no raw bytes, body_json is serialized with orjson.
+    """
+    body = request_ctx.body_bytes
+    if not body:
+        body_json = request_ctx.body_json
+        if body_json is None:
+            return {}
+        body = orjson.dumps(body_json)
+
+    if isinstance(headers, dict):
+        headers.setdefault("content-type", "application/json")
+    return {"content": body}
+
+
+async def _set_on_disconnect(request, event: asyncio.Event, interval: float = 1.0):
+    """Set `event` once the client behind `request` disconnects"""
+    while not await request.is_disconnected():
+        await asyncio.sleep(interval)
+    event.set()
+
+
+async def _forward(
+    request_ctx: RequestContext,
+    homeserver: HomeserverService,
+    *,
+    strip_content_length: bool = False,
+    forward_query: bool = True,
+    forward_body: bool = False,
+    **send_kwargs,
+) -> Response:
+    """
+    Forward the inbound request to the homeserver on the same path and method.
+
+    The shared path for handlers that don't need to inspect or rewrite the request.
+    Extra keyword arguments are passed through to HomeserverService.send_request.
+
+    Args:
+        strip_content_length: copy the headers without content-length (for bodies that are re-serialized)
+        forward_query: forward the inbound query params
+        forward_body: forward the inbound JSON body
+    """
+    if strip_content_length:
+        headers = prep_headers(request_ctx)
+    else:
+        headers = _passthrough_headers(request_ctx)
+
+    if forward_query:
+        send_kwargs.setdefault(
+            "query_params",
+            (
+                request_ctx.query_params
+                if request_ctx.query_params is not None
+                else request_ctx.request.query_params
             ),
         )
+    if forward_body:
+        for key, value in body_kwargs(request_ctx, headers).items():
+            send_kwargs.setdefault(key, value)
 
-    @staticmethod
-    async def register(
-        request_ctx: RequestContext, homeserver: HomeserverService
-    ) -> Response:
-        """
-        Handle /_matrix/client/v3/register endpoint.
+    return await homeserver.send_request(
+        request_ctx=request_ctx,
+        method=request_ctx.request.method,
+        path=request_ctx.path,
+        headers=headers,
+        **send_kwargs,
+    )
 
-        Allows bridges to register new users on the homeserver.
-        Typically used with m.login.application_service type.
-        """
-        headers = (
-            request_ctx.headers.copy()
-            if request_ctx and request_ctx.headers is not None
-            else dict(request_ctx.request.headers).copy()
-        )
-        headers.pop("content-length", None)
 
-        return await homeserver.send_request(
-            request_ctx=request_ctx,
-            method=request_ctx.request.method,
-            path=request_ctx.request.path_params["path"],
-            headers=headers,
-            query_params=request_ctx.query_params,
-            json=request_ctx.body_json,
-        )
+@dataclass(frozen=True)
+class HandlerSpec:
+    """
+    Describes a handler that forwards the request to the homeserver unchanged,
+    see _make_forwarder.
+    """
 
-    @staticmethod
-    async def profile_avatar_url(
+    strip_content_length: bool = False
+    forward_query: bool = True
+    forward_body: bool = False
+    stream: bool = False
+
+
+def _make_forwarder(spec: HandlerSpec) -> staticmethod:
+    """
+    Build a pass-through handler for `spec`. Handlers are built once at import
+    so the per-request work is a single call into _forward.
+    """
+    forward_kwargs = {
+        "strip_content_length": spec.strip_content_length,
+        "forward_query": spec.forward_query,
+        "forward_body": spec.forward_body,
+    }
+    if spec.stream:
+        forward_kwargs["stream"] = True
+
+    async def handler(
         request_ctx: RequestContext, homeserver: HomeserverService
     ) -> Response:
-        """
-        Handle /_matrix/client/v3/profile/{userId}/avatar_url endpoint.
+        return await _forward(request_ctx, homeserver, **forward_kwargs)
 
-        Get or set user avatar URLs.
+    return staticmethod(handler)
 
-        For PUT requests, adds the user_id query parameter to enable
-        Application Service impersonation per Matrix AS API spec.
-        """
-        import re
 
-        path = request_ctx.request.path_params.get("path")
+_CREATE_ROOM_ID_RE = re.compile(rb'"room_id"\s*:\s*"(![^"\\]+)"')
 
-        # Extract user_id from path: /profile/{userId}/avatar_url
-        match = re.search(r"/profile/(@[^/]+)/", path)
-        user_id = match.group(1) if match else None
 
-        headers = (
-            request_ctx.headers.copy()
-            if request_ctx and request_ctx.headers is not None
-            else dict(request_ctx.request.headers).copy()
-        )
-        headers.pop("content-length", None)
+def _room_id_from_create_response(body: bytes) -> Optional[str]:
+    """
+    Pull room_id out of a createRoom response with a byte scan, only parsing the
+    whole body if the scan misses (e.g. an escaped room ID).
+    """
+    if not body:
+        return None
+    match = _CREATE_ROOM_ID_RE.search(body)
+    if match:
+        return match.group(1).decode("utf-8")
+    return orjson.loads(body).get("room_id")
 
-        # Add user_id query parameter for AS impersonation
-        query_params = (
-            request_ctx.query_params.copy() if request_ctx.query_params else {}
-        )
-        if user_id and request_ctx.request.method.upper() == "PUT":
-            query_params["user_id"] = user_id
-            logger.info(f"Adding user_id query param for avatar_url: {user_id}")
 
-        return await homeserver.send_request(
-            request_ctx=request_ctx,
-            method=request_ctx.request.method,
-            path=path,
-            headers=headers,
-            json=request_ctx.body_json,
-            query_params=query_params,
-        )
+def _describe_room_create(body_json) -> Tuple[str, str]:
+    """
+    Return (room_type, room_name) of a createRoom body for logging.
+    """
+    room_name = "unnamed"
+    if not body_json or not isinstance(body_json, dict):
+        return "room", room_name
 
-    @staticmethod
-    async def profile_displayname(
-        request_ctx: RequestContext, homeserver: HomeserverService
-    ) -> Response:
-        """
-        Handle /_matrix/client/v3/profile/{userId}/displayname endpoint.
+    for state_event in body_json.get("initial_state", []):
+        if state_event.get("type") == "m.room.name":
+            room_name = state_event.get("content", {}).get("name", "unnamed")
+            break
+    # Fallback to direct name field
+    if room_name == "unnamed" and "name" in body_json:
+        room_name = body_json["name"]
 
-        Get or set user display names.
-        """
-        path = request_ctx.request.path_params.get("path")
+    return ("DM" if body_json.get("is_direct", False) else "room"), room_name
 
-        query_params = (
-            request_ctx.query_params.copy()
-            if request_ctx and request_ctx.query_params is not None
-            else dict(request_ctx.request.query_params)
-        )
 
-        headers = (
-            request_ctx.headers.copy()
-            if request_ctx and request_ctx.headers is not None
-            else dict(request_ctx.request.headers).copy()
-        )
-        headers.pop("content-length", None)
+class _BodyPreview:
+    """
+    Log argument that renders a short preview of a message body.
+    Logging only calls str() on records that are emitted, so the body isn't touched otherwise.
+    """
+
+    __slots__ = ("body_json",)
+
+    def __init__(self, body_json):
+        self.body_json = body_json
+
+    def __str__(self) -> str:
+        if not isinstance(self.body_json, dict) or "body" not in self.body_json:
+            return ""
+        body_text = self.body_json["body"]
+        if len(body_text) > 50:
+            return f", body='{body_text[:50]}...'"
+        return f", body='{body_text}'"
+
+
+def _room_id_from_path(path: str, action: str) -> str:
+    """Extract the room id from a .../rooms/{roomId}/{action} path for logging"""
+    segments = _segments_after(path, "rooms")
+    if segments and len(segments) > 1 and segments[0] and segments[1] == action:
+        return segments[0]
+    return "unknown"
+
+
+def _flush_room_mappings(batch: List[Tuple[str, int]]) -> None:
+    _room_bridge_repo.bulk_upsert(batch)
+
+
+# Room-bridge mappings are written behind the request in batches, started/stopped with the app.
+# Pairs queued within the last _SEEN_ROOM_MAPPINGS_TTL seconds are skipped, so each room's
+# last_seen_at is still refreshed periodically. The seen map is an insertion-ordered dict
+# used as a FIFO so the oldest pairs are dropped once it's full.
+room_mapping_queue = WriteBehindQueue(_flush_room_mappings, name="room_bridge_mappings")
+_SEEN_ROOM_MAPPINGS_MAX = 100_000
+_SEEN_ROOM_MAPPINGS_TTL = 3600.0
+_seen_room_mappings: Dict[Tuple[str, int], float] = {}
+
+
+def _queue_room_mapping(room_id: str, bridge_id: int) -> bool:
+    """
+    Queue a room-bridge mapping write unless the pair was queued recently.
+    Returns True if it was queued.
+    """
+    key = (room_id, bridge_id)
+    now = time.monotonic()
+    expires_at = _seen_room_mappings.get(key)
+    if expires_at is not None:
+        if expires_at > now:
+            return False
+        # expired, re-insert at the back of the FIFO
+        del _seen_room_mappings[key]
+    elif len(_seen_room_mappings) >= _SEEN_ROOM_MAPPINGS_MAX:
+        del _seen_room_mappings[next(iter(_seen_room_mappings))]
+
+    _seen_room_mappings[key] = now + _SEEN_ROOM_MAPPINGS_TTL
+    room_mapping_queue.put(key)
+    return True
+
+
+# Responses for endpoints whose data rarely changes (versions, media config),
+# keyed on (homeserver url, path) -> (expires_at, body, status_code)
+_STATIC_RESPONSE_TTL = 60.0
+_static_response_cache: Dict[Tuple[str, str], Tuple[float, bytes, int]] = {}
+# Upstream GETs currently in flight for the same keys, so concurrent misses share one call
+_static_inflight: Dict[Tuple[str, str], asyncio.Future] = {}
+
+
+async def _cached_static_get(
+    request_ctx: RequestContext, homeserver: HomeserverService
+) -> Response:
+    """
+    Forward a request for rarely-changing homeserver data, serving successful
+    GET responses from an in-process cache for _STATIC_RESPONSE_TTL seconds.
+    Concurrent GETs that miss the cache wait on a single upstream request.
+    """
+    path = request_ctx.path
+    method = request_ctx.request.method
+    key = (request_ctx.homeserver.url, path)
 
+    if method != "GET":
         return await homeserver.send_request(
             request_ctx=request_ctx,
-            method=request_ctx.request.method,
+            method=method,
             path=path,
-            headers=headers,
-            query_params=query_params,
-            json=request_ctx.body_json,
+            headers=_passthrough_headers(request_ctx),
         )
 
-    @staticmethod
-    async def profile(
-        request_ctx: RequestContext, homeserver: HomeserverService
-    ) -> Response:
-        """
-        Handle /_matrix/client/v3/profile/{userId} endpoint.
-
-        Get the combined profile information (displayname and avatar_url) for a user.
-        Returns: {"displayname": "...", "avatar_url": "..."}
-        """
-        path = request_ctx.request.path_params.get("path")
-
-        query_params = (
-            request_ctx.query_params.copy()
-            if request_ctx and request_ctx.query_params is not None
-            else dict(request_ctx.request.query_params)
+    cached = _static_response_cache.get(key)
+    if cached is not None and cached[0] > time.monotonic():
+        return Response(
+            content=cached[1], status_code=cached[2], media_type="application/json"
         )
 
-        headers = (
-            request_ctx.headers.copy()
-            if request_ctx and request_ctx.headers is not None
-            else dict(request_ctx.request.headers).copy()
+    inflight = _static_inflight.get(key)
+    if inflight is None:
+        # the upstream GET runs as its own task, so the caller that started it going
+        # away doesn't cancel it for everyone else waiting on it
+        inflight = asyncio.ensure_future(_fetch_static(request_ctx, homeserver, key))
+        _static_inflight[key] = inflight
+        inflight.add_done_callback(lambda f: _static_inflight.pop(key, None))
+        # mark the outcome as retrieved even if every waiter went away
+        inflight.add_done_callback(lambda f: f.cancelled() or f.exception())
+
+    body, status_code = await asyncio.shield(inflight)
+    return Response(
+        content=body, status_code=status_code, media_type="application/json"
+    )
+
+
+async def _fetch_static(
+    request_ctx: RequestContext, homeserver: HomeserverService, key: Tuple[str, str]
+) -> Tuple[bytes, int]:
+    """Upstream GET shared by _cached_static_get callers, caching a successful response"""
+    response = await homeserver.send_request(
+        request_ctx=request_ctx,
+        method="GET",
+        path=request_ctx.path,
+        headers=_passthrough_headers(request_ctx),
+    )
+    if response.status_code == 200:
+        _static_response_cache[key] = (
+            time.monotonic() + _STATIC_RESPONSE_TTL,
+            response.body,
+            response.status_code,
         )
-        headers.pop("content-length", None)
+    return response.body, response.status_code
+
+
+# Sub-requests a single /_bridge_manager/batch call may carry
+_BATCH_MAX_REQUESTS = 20
+_BATCH_METHODS = frozenset({"GET", "POST", "PUT", "DELETE"})
+_BATCH_PATH = "_bridge_manager/batch"
+
+
+def _batch_item_error(sub) -> Optional[str]:
+    """Why a batch item can't be run, or None if it's well formed"""
+    if not isinstance(sub, dict):
+        return "Each request must be an object"
+    method = sub.get("method", "GET")
+    if not isinstance(method, str) or method not in _BATCH_METHODS:
+        return f"Method must be one of {', '.join(sorted(_BATCH_METHODS))}"
+    url = sub.get("url")
+    if not isinstance(url, str) or not url.lstrip("/"):
+        return "Missing or invalid 'url'"
+    if url.lstrip("/").partition("?")[0] == _BATCH_PATH:
+        return "Batches can't be nested"
+    headers = sub.get("headers")
+    if headers is not None and not (
+        isinstance(headers, dict)
+        and all(isinstance(v, str) for v in headers.values())
+    ):
+        return "'headers' must be an object of strings"
+    return None
+
+
+async def _run_batch_item(
+    request_ctx: RequestContext, base_headers: Dict[str, str], sub
+) -> dict:
+    """Route one batch item through the bridge and describe its result"""
+    from .homeserver_service import HomeserverRequestError
+    from .models import RequestContext
 
-        return await homeserver.send_request(
-            request_ctx=request_ctx,
-            method=request_ctx.request.method,
+    sub_id = sub.get("id") if isinstance(sub, dict) else None
+
+    error = _batch_item_error(sub)
+    if error:
+        return {"id": sub_id, "status": 400, "body": {"error": error}}
+
+    path, _, query = sub["url"].lstrip("/").partition("?")
+    headers = {**base_headers, **(sub.get("headers") or {})}
+    for name in list(headers):
+        if name.lower() in _HOP_BY_HOP:
+            del headers[name]
+
+    try:
+        sub_ctx = RequestContext.derive(
+            request_ctx,
+            method=sub.get("method", "GET"),
             path=path,
+            query_params=dict(parse_qsl(query)),
             headers=headers,
-            query_params=query_params,
+            body_json=sub.get("body"),
         )
+        result = await request_ctx.bridge.handle_request(sub_ctx)
+    except HomeserverRequestError as e:
+        # the homeserver's own status and Matrix error, as a direct call would see it
+        logger.info("Batch sub-request %s got status %s", sub_id, e.status_code)
+        body = e.content if isinstance(e.content, dict) else {"error": str(e.content)}
+        return {"id": sub_id, "status": e.status_code, "body": body}
+    except Exception as e:
+        logger.error("Batch sub-request %s failed: %s", sub_id, e)
+        return {"id": sub_id, "status": 502, "body": {"error": str(e)}}
+
+    sub_ctx.log_response(result)
+
+    if not hasattr(result, "body"):
+        # streamed responses can't be embedded, release the upstream connection
+        if result.background is not None:
+            await result.background()
+        return {
+            "id": sub_id,
+            "status": 501,
+            "body": {"error": "Streamed endpoints can't be batched"},
+        }
+
+    if not result.body:
+        return {"id": sub_id, "status": result.status_code, "body": None}
+    try:
+        return {
+            "id": sub_id,
+            "status": result.status_code,
+            "body": orjson.loads(result.body),
+        }
+    except orjson.JSONDecodeError:
+        return {
+            "id": sub_id,
+            "status": 502,
+            "body": {"error": "Response body is not JSON"},
+        }
 
-    @staticmethod
-    async def sync(
-        request_ctx: RequestContext, homeserver: HomeserverService
-    ) -> Response:
-        """
-        Handle /_matrix/client/v3/sync endpoint.
 
-        Long-polling endpoint for receiving events.
-        """
-        return await homeserver.send_request(
-            request_ctx=request_ctx,
-            method=request_ctx.request.method,
-            path=request_ctx.request.path_params["path"],
-            headers=(
-                request_ctx.headers
-                if request_ctx and request_ctx.headers is not None
-                else dict(request_ctx.request.headers)
-            ),
-            query_params=request_ctx.query_params,
-        )
+class MatrixClientAPIHandlers:
+    """
+    Reusable handlers for standard Matrix Client API endpoints.
+
+    These are bridge-agnostic implementations that can be used by any
+    bridge service. Override specific handlers in bridge subclasses
+    if custom behavior is needed.
+
+    Endpoints that are forwarded unchanged are declared with a HandlerSpec and
+    generated by _make_forwarder rather than written out by hand.
+    """
 
     @staticmethod
-    async def room_send(
+    async def versions(
         request_ctx: RequestContext, homeserver: HomeserverService
     ) -> Response:
         """
-        Handle /_matrix/client/v3/rooms/{roomId}/send/{eventType}/{txnId} endpoint.
+        Handle /_matrix/client/versions endpoint.
 
-        Send events to rooms.
+        Returns Matrix protocol versions supported by the homeserver.
+        This is typically the first request bridges make. Cached briefly since it
+        rarely changes.
         """
-        headers = (
-            request_ctx.headers.copy()
-            if request_ctx and request_ctx.headers is not None
-            else dict(request_ctx.request.headers).copy()
-        )
-        headers.pop("content-length", None)
-
-        return await homeserver.send_request(
-            request_ctx=request_ctx,
-            method=request_ctx.request.method,
-            path=request_ctx.request.path_params["path"],
-            headers=headers,
-            json=request_ctx.body_json,
-        )
+        return await _cached_static_get(request_ctx, homeserver)
 
     @staticmethod
-    async def room_state(
+    async def batch(
         request_ctx: RequestContext, homeserver: HomeserverService
     ) -> Response:
         """
-        Handle /_matrix/client/v3/rooms/{roomId}/state/{eventType} endpoint.
+        Handle the bridge manager's own /_bridge_manager/batch endpoint.
 
-        Get or send state events.
+        Lets a bridge send several Client API calls in one round trip. Each sub-request
+        gets its own RequestContext and is routed through the bridge's route registry
+        like a request sent directly, so it only reaches the endpoints (and handler
+        logic) the bridge could reach anyway. Sub-requests run concurrently.
+
+        Body:
+            {"requests": [{"id": ..., "method": "GET", "url": "_matrix/...",
+                           "headers": {...}, "body": {...}}, ...]}
+
+        Returns:
+            {"responses": [{"id": ..., "status": 200, "body": {...}}, ...]}
+            A sub-request that can't be run gets an error status and
+            {"error": ...} body of its own, the rest of the batch still runs.
         """
-        headers = (
-            request_ctx.headers.copy()
-            if request_ctx and request_ctx.headers is not None
-            else dict(request_ctx.request.headers).copy()
+        body_json = request_ctx.body_json
+        if not isinstance(body_json, dict):
+            return JSONResponse(
+                content={"error": "Body must be a JSON object"}, status_code=400
+            )
+        sub_requests = body_json.get("requests")
+        if not isinstance(sub_requests, list):
+            return JSONResponse(
+                content={"error": "Missing or invalid 'requests' list"},
+                status_code=400,
+            )
+        if len(sub_requests) > _BATCH_MAX_REQUESTS:
+            return JSONResponse(
+                content={
+                    "error": f"A batch can hold at most {_BATCH_MAX_REQUESTS} requests"
+                },
+                status_code=400,
+            )
+
+        base_headers = prep_headers(request_ctx)
+
+        results = await asyncio.gather(
+            *(_run_batch_item(request_ctx, base_headers, sub) for sub in sub_requests)
         )
-        headers.pop("content-length", None)
+        return JSONResponse(content={"responses": results})
 
-        return await homeserver.send_request(
-            request_ctx=request_ctx,
-            method=request_ctx.request.method,
-            path=request_ctx.request.path_params["path"],
-            headers=headers,
-            json=request_ctx.body_json,
-        )
+    # /_matrix/client/v3/account/whoami
+    # Bridges use this to verify their identity, returns the bridge bot's user_id
+    whoami = _make_forwarder(HandlerSpec())
 
-    # i
     @staticmethod
-    async def media_download(
+    async def media_config(
         request_ctx: RequestContext, homeserver: HomeserverService
     ) -> Response:
         """
-        Handle /_matrix/client/v1/media/download/{serverName}/{mediaId} endpoint.
+        Handle /_matrix/client/v1/media/config endpoint.
 
-        Bridges use this to download media from the homeserver's media repository.
-        The response is typically binary data (image, video, file, etc.).
+        Returns media repository configuration (upload limits, etc.).
+        Cached briefly since it rarely changes.
         """
-        path = request_ctx.request.path_params.get("path")
+        return await _cached_static_get(request_ctx, homeserver)
 
-        return await homeserver.send_request(
-            request_ctx=request_ctx,
-            method=request_ctx.request.method,
-            path=path,
-            headers=(
-                request_ctx.headers
-                if request_ctx and request_ctx.headers is not None
-                else dict(request_ctx.request.headers)
-            ),
-            query_params=request_ctx.query_params,
-        )
+    # /_matrix/client/v3/register
+    # Registers new users on the homeserver, typically m.login.application_service
+    register = _make_forwarder(
+        HandlerSpec(strip_content_length=True, forward_body=True)
+    )
 
     @staticmethod
-    async def media_upload(
+    async def profile_avatar_url(
         request_ctx: RequestContext, homeserver: HomeserverService
     ) -> Response:
         """
-        Handle /_matrix/client/v1/media/upload endpoint.
+        Handle /_matrix/client/v3/profile/{userId}/avatar_url endpoint.
 
-        Bridges use this to upload media to the homeserver.
+        Get or set user avatar URLs.
+
+        For PUT requests, adds the user_id query parameter to enable
+        Application Service impersonation per Matrix AS API spec.
         """
-        path = request_ctx.request.path_params.get("path")
+        path = request_ctx.path
 
-        headers = (
-            request_ctx.headers.copy()
-            if request_ctx and request_ctx.headers is not None
-            else dict(request_ctx.request.headers).copy()
+        # Extract user_id from path: /profile/{userId}/avatar_url
+        segments = _segments_after(path, "profile")
+        user_id = (
+            segments[0]
+            if segments and len(segments) > 1 and segments[0].startswith("@")
+            else None
         )
-        # Keep content-type for media uploads, but remove content-length
-        headers.pop("content-length", None)
 
-        # Get raw body bytes for media upload
-        body_bytes = await request_ctx.request.body()
+        headers = prep_headers(request_ctx)
+
+        # Add user_id query parameter for AS impersonation
+        # Only build a new dict when the params actually change
+        method = request_ctx.request.method
+        query_params = request_ctx.query_params
+        if user_id and method.upper() == "PUT":
+            query_params = {**(query_params or {}), "user_id": user_id}
+            logger.info("Adding user_id query param for avatar_url: %s", user_id)
 
         return await homeserver.send_request(
             request_ctx=request_ctx,
-            method=request_ctx.request.method,
+            method=method,
             path=path,
             headers=headers,
-            data=body_bytes,
-            query_params=request_ctx.query_params,
+            query_params=query_params,
+            **body_kwargs(request_ctx, headers),
         )
 
+    # /_matrix/client/v3/profile/{userId}/displayname
+    # Get or set user display names
+    profile_displayname = _make_forwarder(
+        HandlerSpec(strip_content_length=True, forward_body=True)
+    )
+
+    # /_matrix/client/v3/profile/{userId}
+    # Combined profile: {"displayname": "...", "avatar_url": "..."}
+    profile = _make_forwarder(HandlerSpec(strip_content_length=True))
+
     @staticmethod
-    async def room_join(
+    async def sync(
         request_ctx: RequestContext, homeserver: HomeserverService
     ) -> Response:
         """
-        Handle /_matrix/client/v3/rooms/{roomId}/join endpoint.
-
-        Bridges use this to join rooms on behalf of their users.
-
-        Per Matrix spec:
-        - This endpoint starts a user participating in a particular room
-        - Optional body fields: reason (string), third_party_signed (object)
-        - Returns: {"room_id": "!room:example.org"}
-        - Supports user_id query parameter for AS impersonation
+        Handle /_matrix/client/v3/sync endpoint.
 
-        Flow:
-        1. Bridge sends POST /rooms/{roomId}/join?user_id={bridged_user}
-        2. Bridge Manager forwards to homeserver with proper authentication
-        3. Homeserver processes join and returns room_id
-        4. Bridge Manager passes response back to bridge
+        Long-polling endpoint for receiving events. If the bridge disconnects
+        mid-poll the upstream request is cancelled to free its connection.
+        Sync responses can be many MB, so the body is streamed back as it
+        arrives instead of being buffered.
         """
-        import re
-
-        path = request_ctx.request.path_params.get("path")
-
-        # Extract room_id from path for logging
-        match = re.search(r"/rooms/([^/]+)/join", path)
-        room_id = match.group(1) if match else "unknown"
-
-        # Prepare headers (remove content-length for recomputation)
-        headers = (
-            request_ctx.headers.copy()
-            if request_ctx and request_ctx.headers is not None
-            else dict(request_ctx.request.headers).copy()
+        cancel_event = asyncio.Event()
+        watcher = asyncio.create_task(
+            _set_on_disconnect(request_ctx.request, cancel_event)
         )
-        headers.pop("content-length", None)
+        try:
+            return await _forward(
+                request_ctx, homeserver, stream=True, cancel_event=cancel_event
+            )
+        finally:
+            watcher.cancel()
+
+    # /_matrix/client/v3/rooms/{roomId}/send/{eventType}/{txnId}
+    # Send events to rooms
+    room_send = _make_forwarder(
+        HandlerSpec(strip_content_length=True, forward_query=False, forward_body=True)
+    )
+
+    # /_matrix/client/v3/rooms/{roomId}/state/{eventType}
+    # Get or send state events
+    room_state = _make_forwarder(
+        HandlerSpec(strip_content_length=True, forward_query=False, forward_body=True)
+    )
+
+    # /_matrix/client/v1/media/download/{serverName}/{mediaId}
+    # Binary media from the homeserver's media repository, streamed rather than buffered
+    media_download = _make_forwarder(HandlerSpec(stream=True))
 
-        # Preserve query parameters (user_id for AS impersonation)
-        query_params = (
-            request_ctx.query_params.copy() if request_ctx.query_params else {}
-        )
+    @staticmethod
+    async def media_upload(
+        request_ctx: RequestContext, homeserver: HomeserverService
+    ) -> Response:
+        """
+        Handle /_matrix/client/v1/media/upload endpoint.
 
-        # Extract user_id from query params for logging
-        user_id = query_params.get("user_id", "not specified")
-        logger.info(f"Room join request: room={room_id}, user={user_id}")
+        Bridges use this to upload media to the homeserver.
+        """
+        path = request_ctx.path
+
+        # The body is streamed through unchanged, so keep content-length. Without it
+        # httpx sends the stream chunked, which the homeserver rejects for uploads
+        headers = _passthrough_headers(request_ctx)
 
-        # Forward to homeserver with optional body (reason, third_party_signed)
+        # Stream the upload through in chunks instead of reading it all into memory
         return await homeserver.send_request(
             request_ctx=request_ctx,
             method=request_ctx.request.method,
             path=path,
             headers=headers,
-            json=request_ctx.body_json if request_ctx.body_json else None,
-            query_params=query_params,
+            data_stream=request_ctx.request.stream(),
+            query_params=request_ctx.query_params,
         )
 
     @staticmethod
@@ -429,33 +705,25 @@ class MatrixClientAPIHandlers:
         3. Homeserver returns array of all state events
         4. Bridge Manager passes response back to bridge
         """
-        import re
-
-        path = request_ctx.request.path_params.get("path")
+        path = request_ctx.path
 
         # Extract room_id from path for logging
-        match = re.search(r"/rooms/([^/]+)/state$", path)
-        room_id = match.group(1) if match else "unknown"
+        room_id = _room_id_from_path(path, "state")
 
         # Preserve query parameters (user_id for AS impersonation)
-        query_params = (
-            request_ctx.query_params.copy() if request_ctx.query_params else {}
-        )
+        query_params = request_ctx.query_params or {}
 
         # Extract user_id from query params for logging
         user_id = query_params.get("user_id", "not specified")
-        logger.info(f"Room state request: room={room_id}, user={user_id}")
+        if logger.isEnabledFor(logging.INFO):
+            logger.info("Room state request: room=%s, user=%s", room_id, user_id)
 
         # Forward to homeserver (GET request, no body)
         return await homeserver.send_request(
             request_ctx=request_ctx,
             method=request_ctx.request.method,
             path=path,
-            headers=(
-                request_ctx.headers
-                if request_ctx and request_ctx.headers is not None
-                else dict(request_ctx.request.headers)
-            ),
+            headers=_passthrough_headers(request_ctx),
             query_params=query_params,
         )
 
@@ -483,47 +751,43 @@ class MatrixClientAPIHandlers:
         3. Homeserver returns state content (GET) or event_id (PUT)
         4. Bridge Manager passes response back to bridge
         """
-        import re
-        import json
-
-        path = request_ctx.request.path_params.get("path")
+        path = request_ctx.path
         method = request_ctx.request.method
 
         # Extract room_id and event_type from path for logging
-        match = re.search(r"/rooms/([^/]+)/state/([^/]+)(?:/(.*))?$", path)
-        if match:
-            room_id = match.group(1)
-            event_type = match.group(2)
-            state_key = match.group(3) if match.group(3) is not None else ""
+        # .../rooms/{roomId}/state/{eventType}[/{stateKey}]
+        segments = _segments_after(path, "rooms")
+        if segments and len(segments) > 2 and segments[1] == "state" and segments[2]:
+            room_id = segments[0]
+            event_type = segments[2]
+            state_key = "/".join(segments[3:])
         else:
             room_id = "unknown"
             event_type = "unknown"
             state_key = ""
 
         # Preserve query parameters (user_id for AS impersonation)
-        query_params = (
-            request_ctx.query_params.copy() if request_ctx.query_params else {}
-        )
+        query_params = request_ctx.query_params or {}
 
         # Extract user_id from query params for logging
         user_id = query_params.get("user_id", "not specified")
         logger.info(
-            f"Room state event ({method}): room={room_id}, type={event_type}, key='{state_key}', user={user_id}"
+            "Room state event (%s): room=%s, type=%s, key='%s', user=%s",
+            method,
+            room_id,
+            event_type,
+            state_key,
+            user_id,
         )
 
         # Prepare headers and remove content-length
-        headers = (
-            request_ctx.headers.copy()
-            if request_ctx and request_ctx.headers is not None
-            else dict(request_ctx.request.headers).copy()
-        )
-        headers.pop("content-length", None)
+        headers = prep_headers(request_ctx)
 
-        # Prepare body for PUT requests
-        body_json = None
+        # Forward the body as received for PUT requests
+        body = {}
         if method in ["PUT", "POST"]:
-            body_json = request_ctx.body_json if request_ctx else None
-            logger.info(f"State event body: {body_json}")
+            logger.debug("State event body: %s", request_ctx.body_json)
+            body = body_kwargs(request_ctx, headers)
 
         # Forward to homeserver
         return await homeserver.send_request(
@@ -532,7 +796,7 @@ class MatrixClientAPIHandlers:
             path=path,
             headers=headers,
             query_params=query_params,
-            json=body_json,  # Use json parameter for proper JSON serialization
+            **body,
         )
 
     @staticmethod
@@ -557,48 +821,34 @@ class MatrixClientAPIHandlers:
         3. Homeserver sends invite and returns {}
         4. Bridge Manager passes response back to bridge
         """
-        import json
-        import re
-
-        path = request_ctx.request.path_params.get("path")
+        path = request_ctx.path
 
         # Extract room_id from path for logging
-        match = re.search(r"/rooms/([^/]+)/invite", path)
-        room_id = match.group(1) if match else "unknown"
+        room_id = _room_id_from_path(path, "invite")
 
         # Get invitee from body
-        body_json = request_ctx.body_json if request_ctx else None
+        body_json = request_ctx.body_json
         invitee = body_json.get("user_id") if body_json else "unknown"
 
         # Preserve query parameters (user_id for AS impersonation - the inviter)
-        query_params = (
-            request_ctx.query_params.copy() if request_ctx.query_params else {}
-        )
+        query_params = request_ctx.query_params or {}
         inviter = query_params.get("user_id", "not specified")
 
         logger.info(
-            f"Room invite: room={room_id}, inviter={inviter}, invitee={invitee}"
+            "Room invite: room=%s, inviter=%s, invitee=%s", room_id, inviter, invitee
         )
 
         # Prepare headers
-        headers = (
-            request_ctx.headers.copy()
-            if request_ctx and request_ctx.headers is not None
-            else dict(request_ctx.request.headers).copy()
-        )
-        headers.pop("content-length", None)
-
-        # Prepare body
-        body = json.dumps(body_json) if body_json else None
+        headers = prep_headers(request_ctx)
 
-        # Forward to homeserver
+        # Forward to homeserver, body bytes as received
         return await homeserver.send_request(
             request_ctx=request_ctx,
             method=request_ctx.request.method,
             path=path,
             headers=headers,
             query_params=query_params,
-            data=body,
+            **body_kwargs(request_ctx, headers),
         )
 
     @staticmethod
@@ -623,54 +873,22 @@ class MatrixClientAPIHandlers:
         3. Homeserver adds user to room and returns {"room_id": "..."}
         4. Bridge Manager passes response back to bridge
         """
-        import json
-        import re
-        from urllib.parse import unquote
-
-        path = request_ctx.request.path_params.get("path")
-
-        # Extract room_id from path for logging
-        # match = re.search(r"/rooms/([^/]+)/join", path)
-        # room_id = unquote(match.group(1)) if match else "unknown"
+        path = request_ctx.path
 
         # Preserve query parameters (user_id for AS impersonation)
-        query_params = (
-            request_ctx.query_params.copy() if request_ctx.query_params else {}
-        )
-        # user_id = query_params.get("user_id", "not specified")
-
-        # Extract server name from room ID and add to query params if not present
-        # Room IDs are in format !localpart:server.name
-        # The server_name param tells Matrix which server(s) know about this room
-        # if "server_name" not in query_params and ":" in room_id:
-        #     server_from_room = room_id.split(":", 1)[1]
-        #     query_params["server_name"] = server_from_room
-        #     logger.info(f"Added server_name={server_from_room} to join request")
-
-        # logger.info(
-        #     f"Room join: room={room_id}, user={user_id}, query_params={query_params}"
-        # )
+        query_params = request_ctx.query_params or {}
 
         # Prepare headers
-        headers = (
-            request_ctx.headers.copy()
-            if request_ctx and request_ctx.headers is not None
-            else dict(request_ctx.request.headers).copy()
-        )
-        headers.pop("content-length", None)
-
-        # Prepare body (may be empty)
-        body_json = request_ctx.body_json if request_ctx else None
-        body = json.dumps(body_json) if body_json is not None else None
+        headers = prep_headers(request_ctx)
 
-        # Forward to homeserver
+        # Forward to homeserver, body (may be empty) as received
         return await homeserver.send_request(
             request_ctx=request_ctx,
             method=request_ctx.request.method,
             path=path,
             headers=headers,
             query_params=query_params,
-            data=body,
+            **body_kwargs(request_ctx, headers),
         )
 
     @staticmethod
@@ -693,29 +911,20 @@ class MatrixClientAPIHandlers:
         3. Homeserver returns member list
         4. Bridge Manager passes response back to bridge
         """
-        import re
-
-        path = request_ctx.request.path_params.get("path")
+        path = request_ctx.path
 
         # Extract room_id from path for logging
-        match = re.search(r"/rooms/([^/]+)/members", path)
-        room_id = match.group(1) if match else "unknown"
+        room_id = _room_id_from_path(path, "members")
 
         # Preserve query parameters (user_id for AS impersonation, plus filters)
-        query_params = (
-            request_ctx.query_params.copy() if request_ctx.query_params else {}
-        )
+        query_params = request_ctx.query_params or {}
         user_id = query_params.get("user_id", "not specified")
 
-        logger.info(f"Room members: room={room_id}, user={user_id}")
+        if logger.isEnabledFor(logging.INFO):
+            logger.info("Room members: room=%s, user=%s", room_id, user_id)
 
         # Prepare headers and remove content-length for GET requests
-        headers = (
-            request_ctx.headers.copy()
-            if request_ctx and request_ctx.headers is not None
-            else dict(request_ctx.request.headers).copy()
-        )
-        headers.pop("content-length", None)
+        headers = prep_headers(request_ctx)
 
         # Forward to homeserver (GET request, no body)
         return await homeserver.send_request(
@@ -726,59 +935,6 @@ class MatrixClientAPIHandlers:
             query_params=query_params,
         )
 
-    @staticmethod
-    async def capabilities(
-        request_ctx: RequestContext, homeserver: HomeserverService
-    ) -> Response:
-        """
-        Handle GET /capabilities - Returns server capabilities
-        https://spec.matrix.org/v1.11/client-server-api/#get_matrixclientv3capabilities
-        - User must be joined to the room or have previously been joined
-        - Supports optional query parameters:
-          - at: server_name or event ID to get historical membership
-          - membership: filter by membership state (join, invite, leave, ban)
-          - not_membership: exclude membership state
-          - user_id: for AS impersonation
-
-        Flow:
-        1. Bridge sends GET /rooms/{roomId}/members?user_id={bridged_user}
-        2. Bridge Manager forwards to homeserver with proper authentication
-        3. Homeserver returns {chunk: [m.room.member events]}
-        4. Bridge Manager passes response back to bridge
-        """
-        import re
-
-        path = request_ctx.request.path_params.get("path")
-
-        # Extract room_id from path for logging
-        match = re.search(r"/rooms/([^/]+)/members", path)
-        room_id = match.group(1) if match else "unknown"
-
-        # Preserve all query parameters
-        query_params = (
-            request_ctx.query_params.copy() if request_ctx.query_params else {}
-        )
-
-        # Extract user_id from query params for logging
-        user_id = query_params.get("user_id", "not specified")
-        membership_filter = query_params.get("membership", "all")
-        logger.info(
-            f"Room members request: room={room_id}, user={user_id}, filter={membership_filter}"
-        )
-
-        # Forward to homeserver (GET request, no body)
-        return await homeserver.send_request(
-            request_ctx=request_ctx,
-            method=request_ctx.request.method,
-            path=path,
-            headers=(
-                request_ctx.headers
-                if request_ctx and request_ctx.headers is not None
-                else dict(request_ctx.request.headers)
-            ),
-            query_params=query_params,
-        )
-
     @staticmethod
     async def room_send_event(
         request_ctx: RequestContext, homeserver: HomeserverService
@@ -801,76 +957,57 @@ class MatrixClientAPIHandlers:
         3. Homeserver creates event and returns {event_id}
         4. Bridge Manager passes response back to bridge
         """
-        import re
-
-        path = request_ctx.request.path_params.get("path")
+        path = request_ctx.path
 
         # Extract room_id, event_type, and txnId from path for logging
-        match = re.search(r"/rooms/([^/]+)/send/([^/]+)/(.+)$", path)
-        if match:
-            room_id = match.group(1)
-            event_type = match.group(2)
-            txn_id = match.group(3)
+        segments = _segments_after(path, "rooms")
+        if (
+            segments
+            and len(segments) > 3
+            and segments[1] == "send"
+            and all(segments[:4])
+        ):
+            room_id, _, event_type = segments[:3]
+            txn_id = "/".join(segments[3:])
         else:
             room_id = event_type = txn_id = "unknown"
 
         # Preserve query parameters (user_id for AS impersonation)
-        query_params = (
-            request_ctx.query_params.copy() if request_ctx.query_params else {}
-        )
+        query_params = request_ctx.query_params or {}
 
         # Extract user_id from query params for logging
         user_id = query_params.get("user_id", "not specified")
 
-        # Log basic info about the message being sent
-        body_preview = ""
-        if request_ctx.body_json and isinstance(request_ctx.body_json, dict):
-            if "body" in request_ctx.body_json:
-                body_text = request_ctx.body_json["body"]
-                body_preview = (
-                    f", body='{body_text[:50]}...'"
-                    if len(body_text) > 50
-                    else f", body='{body_text}'"
-                )
-
-        logger.info(
-            f"Send event: room={room_id}, type={event_type}, txn={txn_id}, user={user_id}{body_preview}"
-        )
+        # Log basic info about the message being sent, the preview is only built if a handler emits it
+        if logger.isEnabledFor(logging.INFO):
+            logger.info(
+                "Send event: room=%s, type=%s, txn=%s, user=%s%s",
+                room_id,
+                event_type,
+                txn_id,
+                user_id,
+                _BodyPreview(request_ctx.body_json),
+            )
 
         # Store room-bridge mapping for future discovery
         # This allows us to route transaction events back to the correct bridge
-        if (
-            request_ctx.bridge
-            and hasattr(request_ctx.bridge, "bridge_id")
-            and room_id != "unknown"
-        ):
-            from ..database.repositories import RoomBridgeMappingRepository
-
-            try:
-                RoomBridgeMappingRepository().upsert(
-                    room_id=room_id, bridge_id=request_ctx.bridge.bridge_id
-                )
+        bridge_id = getattr(request_ctx.bridge, "bridge_id", None)
+        if bridge_id is not None and room_id != "unknown":
+            if _queue_room_mapping(room_id, bridge_id):
                 logger.debug(
-                    f"Stored room-bridge mapping: room={room_id}, bridge_id={request_ctx.bridge.bridge_id}"
+                    "Queued room-bridge mapping: room=%s, bridge_id=%s", room_id, bridge_id
                 )
-            except Exception as e:
-                logger.warning(f"Failed to store room-bridge mapping: {e}")
 
-        headers = (
-            request_ctx.headers
-            if request_ctx and request_ctx.headers is not None
-            else dict(request_ctx.request.headers)
-        )
-        headers.pop("content-length", None)
+        headers = prep_headers(request_ctx)
 
-        # Forward to homeserver (PUT request with JSON body)
+        # Forward to homeserver (PUT request with JSON body, bytes as received)
         return await homeserver.send_request(
             request_ctx=request_ctx,
             method=request_ctx.request.method,
             path=path,
             headers=headers,
-            json=request_ctx.body_json if request_ctx.body_json else None,
             query_params=query_params,
+            **body_kwargs(request_ctx, headers),
         )
 
     @staticmethod
@@ -902,43 +1039,21 @@ class MatrixClientAPIHandlers:
         4. Bridge Manager stores room-bridge mapping
         5. Response passed back to bridge
         """
-        path = request_ctx.request.path_params.get("path")
+        path = request_ctx.path
 
         # Preserve query parameters (user_id for AS impersonation)
-        query_params = (
-            request_ctx.query_params.copy() if request_ctx.query_params else {}
-        )
+        query_params = request_ctx.query_params or {}
 
         # Extract user_id from query params for logging
         user_id = query_params.get("user_id", "not specified")
 
-        # Extract room name from body for logging
-        room_name = "unnamed"
-        if request_ctx.body_json and isinstance(request_ctx.body_json, dict):
-            initial_state = request_ctx.body_json.get("initial_state", [])
-            for state_event in initial_state:
-                if state_event.get("type") == "m.room.name":
-                    room_name = state_event.get("content", {}).get("name", "unnamed")
-                    break
-            # Fallback to direct name field
-            if room_name == "unnamed" and "name" in request_ctx.body_json:
-                room_name = request_ctx.body_json["name"]
-
-        is_direct = (
-            request_ctx.body_json.get("is_direct", False)
-            if request_ctx.body_json
-            else False
-        )
-        room_type = "DM" if is_direct else "room"
+        # Extract room name from body for logging, only walked when it will be logged
+        room_type, room_name = "room", "unnamed"
+        if logger.isEnabledFor(logging.INFO):
+            room_type, room_name = _describe_room_create(request_ctx.body_json)
+            logger.info("Create %s: name='%s', user=%s", room_type, room_name, user_id)
 
-        logger.info(f"Create {room_type}: name='{room_name}', user={user_id}")
-
-        headers = (
-            request_ctx.headers
-            if request_ctx and request_ctx.headers is not None
-            else dict(request_ctx.request.headers)
-        )
-        headers.pop("content-length", None)
+        headers = prep_headers(request_ctx)
 
         # Forward to homeserver (POST request with JSON body)
         response = await homeserver.send_request(
@@ -946,42 +1061,28 @@ class MatrixClientAPIHandlers:
             method=request_ctx.request.method,
             path=path,
             headers=headers,
-            json=request_ctx.body_json if request_ctx.body_json else None,
             query_params=query_params,
+            **body_kwargs(request_ctx, headers),
         )
 
         # Extract room_id from response and store mapping
         try:
-            # Parse response to get room_id
-            import json
-
-            response_body = response.body
-            if isinstance(response_body, bytes):
-                response_body = response_body.decode("utf-8")
-            response_data = json.loads(response_body) if response_body else {}
-
-            room_id = response_data.get("room_id")
-
-            if (
-                room_id
-                and request_ctx.bridge
-                and hasattr(request_ctx.bridge, "bridge_id")
-            ):
-                from ..database.repositories import RoomBridgeMappingRepository
-
-                try:
-                    RoomBridgeMappingRepository().upsert(
-                        room_id=room_id, bridge_id=request_ctx.bridge.bridge_id
-                    )
-                    logger.info(
-                        f"✓ Created {room_type} and stored mapping: room={room_id}, name='{room_name}'"
-                    )
-                except Exception as e:
-                    logger.warning(
-                        f"Failed to store room-bridge mapping for {room_id}: {e}"
-                    )
+            room_id = _room_id_from_create_response(response.body)
+            bridge_id = getattr(request_ctx.bridge, "bridge_id", None)
+
+            if room_id and bridge_id is not None:
+                # written by the background writer, the response isn't held up on it.
+                # Early events in the new room are sent by the bridge's own users, so
+                # they resolve by username before the mapping is needed.
+                _queue_room_mapping(room_id, bridge_id)
+                logger.info(
+                    "✓ Created %s and queued mapping: room=%s, name='%s'",
+                    room_type,
+                    room_id,
+                    room_name,
+                )
         except Exception as e:
-            logger.warning(f"Failed to parse createRoom response for mapping: {e}")
+            logger.warning("Failed to parse createRoom response for mapping: %s", e)
 
         return response
 
@@ -995,20 +1096,16 @@ class MatrixClientAPIHandlers:
         """
         logger.info("Get capabilities")
 
-        path = request_ctx.request.path_params.get("path")
+        path = request_ctx.path
 
+        # only forwarded, no need to copy
         query_params = (
-            request_ctx.query_params.copy()
-            if request_ctx and request_ctx.query_params is not None
-            else dict(request_ctx.request.query_params)
+            request_ctx.query_params
+            if request_ctx.query_params is not None
+            else request_ctx.request.query_params
         )
 
-        headers = (
-            request_ctx.headers.copy()
-            if request_ctx and request_ctx.headers is not None
-            else dict(request_ctx.request.headers).copy()
-        )
-        headers.pop("content-length", None)
+        headers = prep_headers(request_ctx)
 
         return await homeserver.send_request(
             request_ctx=request_ctx,
@@ -1039,10 +1136,7 @@ class AppserviceAPIHandlers:
         Bridges send pings to verify connectivity with the homeserver.
         The transaction_id in the ping is stored for routing future requests.
         """
-        import json
-        from ..database.repositories import TransactionMappingsRepository
-
-        body_json = request_ctx.body_json if request_ctx else None
+        body_json = request_ctx.body_json
         if not body_json:
             raise ValueError("Missing or invalid JSON body")
 
@@ -1050,25 +1144,21 @@ class AppserviceAPIHandlers:
         if not transaction_id:
             raise ValueError("Transaction ID missing")
 
-        body = json.dumps(body_json)
-
         # Replace bridge-specific appservice ID with bridge_manager ID
-        path = request_ctx.request.path_params.get("path")
-        import re
+        path = request_ctx.path
+        path = replace_appservice_id(path, bridge_config.ID)
 
-        path = re.sub(r"(_bridge_manager__)[^/]+", rf"{bridge_config.ID}", path)
-
-        headers = (
-            request_ctx.headers.copy()
-            if request_ctx and request_ctx.headers is not None
-            else dict(request_ctx.request.headers).copy()
-        )
-        headers.pop("content-length", None)
+        headers = prep_headers(request_ctx)
 
-        # Store transaction mapping for future routing
+        # Store transaction mapping for future routing. The homeserver calls back into
+        # the appservice ping endpoint with this transaction_id before it answers, so the
+        # row must exist before forwarding; written off the event loop but awaited.
         bridge = request_ctx.bridge
-        TransactionMappingsRepository().upsert(
-            transaction_id, bridge_as_token=bridge.as_token, bridge_id=bridge.bridge_id
+        await asyncio.to_thread(
+            _transaction_mappings_repo.upsert,
+            transaction_id,
+            bridge_as_token=bridge.as_token,
+            bridge_id=bridge.bridge_id,
         )
 
         return await homeserver.send_request(
@@ -1076,5 +1166,5 @@ class AppserviceAPIHandlers:
             method=request_ctx.request.method,
             path=path,
             headers=headers,
-            data=body,
+            **body_kwargs(request_ctx, headers),
         )
@@ -1,15 +1,17 @@
 from __future__ import annotations
 
-from typing import TYPE_CHECKING
-import json
+from typing import TYPE_CHECKING, AsyncIterable, Mapping, Optional
+import asyncio
 import httpx
-import re
+import orjson
 from fastapi import Response
 
-from fastapi.responses import JSONResponse
+from fastapi.responses import JSONResponse, StreamingResponse
+from starlette.background import BackgroundTask
 
 from ..bridge_registry import BridgeRegistry
 from ..database.repositories import TransactionMappingsRepository
+from .common_handlers import body_kwargs, prep_headers
 from .route_registry import RouteRegistry, RouteNotFoundError
 from logger import Logger
 
@@ -18,17 +20,84 @@ if TYPE_CHECKING:
 
 logger = Logger().get_logger(__name__)
 
+# Percent-encoding for every byte value, same output as urllib.parse.quote(safe="")
+_QUOTE_SAFE = frozenset(
+    "ABCDEFGHIJKLMNOPQRSTUVWXYZabcdefghijklmnopqrstuvwxyz0123456789-._~"
+)
+_QUOTE_TABLE = [chr(b) if chr(b) in _QUOTE_SAFE else f"%{b:02X}" for b in range(256)]
+
+
+def _quote_segment(value: str) -> str:
+    """
+    Percent-encode `value` for use as a single path segment, via a table lookup
+    per UTF-8 byte.
+    """
+    return "".join(map(_QUOTE_TABLE.__getitem__, value.encode("utf-8")))
+
+
+# Response bodies above this size are parsed off the event loop
+LARGE_BODY_BYTES = 64 * 1024
+
+
+class HomeserverRequestError(Exception):
+    """Raised when the homeserver answers a forwarded request with a non-2xx status"""
+
+    def __init__(self, status_code: int, content):
+        super().__init__(f"Request failed with status {status_code}: {content}")
+        self.status_code = status_code
+        # parsed JSON error (usually {"errcode": ..., "error": ...}) or the raw text
+        self.content = content
+
+
+async def _close_streamed(send_task: asyncio.Future) -> None:
+    """Close the response of an upstream send that finished but won't be used"""
+    if send_task.done() and not send_task.cancelled() and send_task.exception() is None:
+        await send_task.result().aclose()
+
 
 class HomeserverService:
 
+    # Shared by every instance so connections to the homeserver are pooled and reused.
+    # A HomeserverService is built per bridge service, so this can't live on the instance.
+    _client: Optional[httpx.AsyncClient] = None
+
     def __init__(self, bridge_manager_config):
         self.bridge_registry = BridgeRegistry(bridge_manager_config)
         self.bridge_manager_config = bridge_manager_config
 
+        # The AS token is fixed for the lifetime of the service, build the header value once
+        self._auth_header = f"Bearer {bridge_manager_config.AS_TOKEN}"
+
         # Initialize route registry
         self.routes = RouteRegistry(fallback_handler=self.unhandled_endpoint)
         self._register_routes()
 
+    @classmethod
+    def get_client(cls) -> httpx.AsyncClient:
+        """
+        Returns the shared HTTP client, creating it on first use.
+        """
+        if cls._client is None or cls._client.is_closed:
+            cls._client = httpx.AsyncClient(
+                http2=True,
+                limits=httpx.Limits(
+                    max_connections=200,
+                    max_keepalive_connections=100,
+                    keepalive_expiry=60.0,
+                ),
+                timeout=httpx.Timeout(300.0, connect=10.0),
+            )
+        return cls._client
+
+    @classmethod
+    async def aclose_client(cls) -> None:
+        """
+        Closes the shared HTTP client. Called on application shutdown.
+        """
+        if cls._client is not None:
+            await cls._client.aclose()
+            cls._client = None
+
     def _register_routes(self) -> None:
         """Register Application Service API endpoints"""
         # Exact match for ping
@@ -59,8 +128,8 @@ class HomeserverService:
         Raises:
             RouteNotFoundError: If no route matches
         """
-        path = request_ctx.request.path_params.get("path")
-        logger.info(f"Handling homeserver request to {path}")
+        path = request_ctx.path
+        logger.info("Handling homeserver request to %s", path)
 
         try:
             handler = self.routes.match_or_fallback(path)
@@ -75,7 +144,7 @@ class HomeserverService:
         """
         Default fallback handler for unmatched homeserver endpoints.
         """
-        path = request_ctx.request.path_params.get("path")
+        path = request_ctx.path
         logger.warning(f"Unhandled homeserver endpoint: {path}")
         return JSONResponse(
             content={
@@ -106,45 +175,38 @@ class HomeserverService:
         logger.info("Received ping from homeserver")
 
         # Validate request body contains transaction_id (optional but good practice)
-        body_json = request_ctx.body_json if request_ctx else None
+        body_json = request_ctx.body_json
         if body_json and "transaction_id" in body_json:
             transaction_id = body_json["transaction_id"]
             logger.info(f"Ping transaction_id: {transaction_id}")
 
-        # Return 200 OK with empty JSON (per Matrix AS API spec)
-        return JSONResponse(content={}, status_code=200)
+        # Return 200 OK with empty JSON (per Matrix AS API spec). Built per ping since
+        # middleware may set headers or a background task on the response it's given
+        return Response(content=b"{}", status_code=200, media_type="application/json")
 
     async def users(self, request_ctx: "RequestContext") -> Response:
 
-        path = request_ctx.request.path_params.get("path", "")
-        m = re.match(
-            rf"(?P<endpoint>.*)/@{self.bridge_manager_config.NAMESPACE}(?P<bridge_type>[^_]+)_(?P<bridge_id>[^_]+)__(?P<bridge_username>[^:]+):(?P<homeserver>[^\\s/]+)",
-            path,
-        )
+        # matched once in RequestContext.create, bridge resolution used the same match
+        m = request_ctx.path_match
         if not m:
             return JSONResponse(
                 content={"error": "Invalid encoded username"}, status_code=400
             )
 
-        endpoint = m.group("endpoint")
-        bridge_username = m.group("bridge_username")
-        homeserver_name = m.group("homeserver")
-
-        import urllib.parse
+        # unpacked in one call, group order is fixed by username_in_path_re
+        endpoint, _, _, bridge_username, _ = m.groups()
 
         plain_username = f"@{bridge_username}:{request_ctx.homeserver.name}"
-        encoded_username = urllib.parse.quote(plain_username, safe="")
+        encoded_username = _quote_segment(plain_username)
         new_path = f"{endpoint}/{encoded_username}"
 
-        headers = (
-            request_ctx.headers
-            if request_ctx and request_ctx.headers is not None
-            else dict(request_ctx.request.headers)
-        )
+        # forwarded to a different host, so drop host and the other hop-by-hop headers
+        headers = prep_headers(request_ctx)
 
         # b'{"errcode":"M_NOT_FOUND","error":"User not found"}'
 
         return await request_ctx.bridge.send_request(
+            request_ctx=request_ctx,
             method=request_ctx.request.method,
             path=new_path,
             headers=headers,
@@ -156,77 +218,138 @@ class HomeserverService:
         method,
         path,
         query_params=None,
-        headers=None,
+        headers: Optional[Mapping[str, str]] = None,
         content=None,
         data=None,
         json=None,
+        data_stream: Optional[AsyncIterable[bytes]] = None,
+        stream: bool = False,
+        cancel_event: Optional[asyncio.Event] = None,
         timeout: float = 20,  # Default timeout in seconds
     ) -> Response:
+        """
+        Forward a request to the homeserver.
 
-        headers["authorization"] = f"Bearer {self.bridge_manager_config.AS_TOKEN}"
-        url = f"{request_ctx.homeserver.url}/{path}"
+        Args:
+            data_stream: async iterator of body chunks, sent without buffering the body
+            stream: stream the homeserver's response back instead of parsing it as JSON
+            cancel_event: when set before the homeserver responds, the upstream request
+                is cancelled (e.g. the caller disconnected from a long-poll)
 
-        async with httpx.AsyncClient(timeout=timeout) as client:
-            try:
-                request = client.build_request(
-                    method=method,
-                    url=url,
-                    headers=headers,
-                    params=query_params,
-                    content=content,
-                    json=json,
-                    data=data,
-                )
+        query_params is never modified, handlers pass the context's mapping without copying it.
+        """
 
-                # log the outgoing request
-                request_ctx.log_outbound_request(request)
+        # read-only handlers may pass the request's Headers straight through
+        if not isinstance(headers, dict):
+            headers = dict(headers or {})
+        headers["authorization"] = self._auth_header
+        url = f"{request_ctx.homeserver.url}/{path}"
 
-                response = await client.send(request)
+        if data_stream is not None:
+            content = data_stream
+        elif json is not None:
+            # serialized with orjson rather than httpx's stdlib json encoding
+            content = orjson.dumps(json)
+            headers.setdefault("content-type", "application/json")
 
-                # log response
-                request_ctx.log_response(response)
+        client = self.get_client()
+        try:
+            request = client.build_request(
+                method=method,
+                url=url,
+                headers=headers,
+                params=query_params,
+                content=content,
+                data=data,
+                timeout=timeout,
+            )
 
-            except httpx.TimeoutException:
-                return JSONResponse(
-                    content={"error": "Request timed out"}, status_code=504
+            # log the outgoing request, streamed bodies can't be read without buffering them
+            request_ctx.log_outbound_request(request, include_body=data_stream is None)
+
+            if cancel_event is None:
+                response = await client.send(request, stream=stream)
+            else:
+                send_task = asyncio.ensure_future(client.send(request, stream=stream))
+                cancel_task = asyncio.ensure_future(cancel_event.wait())
+                done = set()
+                try:
+                    done, _ = await asyncio.wait(
+                        {send_task, cancel_task}, return_when=asyncio.FIRST_COMPLETED
+                    )
+                finally:
+                    # also runs when this handler is itself cancelled while waiting,
+                    # so neither task outlives it
+                    cancel_task.cancel()
+                    if send_task not in done:
+                        send_task.cancel()
+                        await _close_streamed(send_task)
+                if send_task not in done:
+                    logger.info(f"Caller went away, cancelled upstream request to {path}")
+                    return JSONResponse(
+                        content={"error": "Client disconnected"}, status_code=499
+                    )
+                response = send_task.result()
+
+            # log response. Logging parses the body, so large ones (e.g. sync) are
+            # logged from a worker thread to keep the event loop free meanwhile
+            if not stream and len(response.content) > LARGE_BODY_BYTES:
+                await asyncio.to_thread(request_ctx.log_response, response)
+            else:
+                request_ctx.log_response(response, include_body=not stream)
+
+        except httpx.TimeoutException:
+            return JSONResponse(content={"error": "Request timed out"}, status_code=504)
+
+        if stream:
+            if not response.is_success:
+                await response.aread()
+                await response.aclose()
+            else:
+                passthrough = {
+                    k: v
+                    for k, v in response.headers.items()
+                    if k in ("content-disposition", "cache-control")
+                }
+                return StreamingResponse(
+                    response.aiter_bytes(),
+                    status_code=response.status_code,
+                    media_type=response.headers.get("content-type"),
+                    headers=passthrough,
+                    background=BackgroundTask(response.aclose),
                 )
 
         if not response.is_success:
             try:
-                error_content = response.json()
+                error_content = orjson.loads(response.content)
             except Exception:
                 error_content = response.text
-            raise Exception(
-                f"Request failed with status {response.status_code}: {error_content}"
-            )
-
-        return JSONResponse(content=response.json(), status_code=response.status_code)
+            raise HomeserverRequestError(response.status_code, error_content)
+
+        # the homeserver's body is already serialized, pass the bytes through with its
+        # content type rather than parsing and re-serializing them
+        return Response(
+            content=response.content,
+            status_code=response.status_code,
+            media_type=response.headers.get("content-type", "application/json"),
+        )
 
     async def transactions(self, request_ctx: "RequestContext") -> Response:
 
         # the request context model will parse the response and find the bridge based on the transaction id if available
         bridge_service = request_ctx.bridge
 
-        body_json = request_ctx.body_json if request_ctx else None
+        body_json = request_ctx.body_json
         if body_json is None:
             return JSONResponse(content={"error": "Invalid JSON body"}, status_code=400)
 
-        # rewritten = request_ctx.rewrite_usernames_in_body(to="bridge")
-        # if rewritten is not None:
-        # body_json = rewritten
-
-        headers = (
-            request_ctx.headers
-            if request_ctx and request_ctx.headers is not None
-            else dict(request_ctx.request.headers)
-        )
-        headers.pop("content-length", None)
+        headers = prep_headers(request_ctx)
 
         response = await bridge_service.send_request(
             request_ctx=request_ctx,
             method=request_ctx.request.method,
-            path=request_ctx.request.path_params["path"],
+            path=request_ctx.path,
             headers=headers,
-            json=body_json,
+            **body_kwargs(request_ctx, headers),
         )
         return response
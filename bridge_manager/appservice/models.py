@@ -1,10 +1,12 @@
 from __future__ import annotations
 
+import asyncio
 import re
-import json
+import orjson
 from datetime import datetime, timezone
-from typing import Optional, Dict, Any, TYPE_CHECKING
+from typing import Optional, Dict, Any, List, Tuple, TYPE_CHECKING
 from enum import Enum
+from urllib.parse import urlencode
 
 from fastapi import Request
 
@@ -17,10 +19,84 @@ from ..database.repositories import (
     RequestsRepository,
 )
 from .bridge_resolver import BridgeResolver, BridgeResolutionMethod
+from .write_behind import WriteBehindQueue
 
 if TYPE_CHECKING:
     from .bridge_service import BridgeService
 
+# Repositories hold no per-request state (each call opens its own session), so share one of each.
+# BridgesRepository caches lookups per instance and is left constructed per call.
+_requests_repo = RequestsRepository()
+_homeservers_repo = HomeserversRepository()
+
+# Resolvers hold no per-request state, one is shared per config so its registry's bridge
+# cache carries over between requests
+_bridge_resolvers: Dict[BridgeManagerConfig, BridgeResolver] = {}
+
+# Request log entries are written in batches by a background task. Each entry's id is
+# taken from a block reserved up front, so the inbound insert and the later outbound and
+# response updates can all be queued without waiting on the database.
+_REQUEST_ID_BLOCK = 100
+_reserved_request_ids: List[int] = []
+# create() reserves the next block from a worker thread once fewer than this many are left
+_REQUEST_ID_LOW_WATER = _REQUEST_ID_BLOCK // 2
+_request_id_refill: Optional[asyncio.Task] = None
+
+
+def _next_request_id() -> int:
+    """
+    Next reserved request id. create() keeps ids reserved ahead, the block is only
+    reserved here, on the calling thread, if they ran out anyway.
+    """
+    if not _reserved_request_ids:
+        ids = _requests_repo.reserve_ids(_REQUEST_ID_BLOCK)
+        _reserved_request_ids.extend(reversed(ids))
+    return _reserved_request_ids.pop()
+
+
+async def _reserve_request_id_block() -> None:
+    global _request_id_refill
+    try:
+        ids = await asyncio.to_thread(_requests_repo.reserve_ids, _REQUEST_ID_BLOCK)
+        # ids still reserved are used first
+        _reserved_request_ids[:0] = reversed(ids)
+    finally:
+        _request_id_refill = None
+
+
+async def _refill_request_ids() -> None:
+    """
+    Reserve the next block of request ids off the event loop once they run low. Only
+    waits on the database when none are left, otherwise the block is reserved while
+    requests carry on using the remaining ids.
+    """
+    global _request_id_refill
+    if len(_reserved_request_ids) >= _REQUEST_ID_LOW_WATER:
+        return
+
+    refill = _request_id_refill
+    if refill is None:
+        refill = _request_id_refill = asyncio.ensure_future(_reserve_request_id_block())
+        # mark the outcome as retrieved, a failed refill is retried by the next request
+        refill.add_done_callback(lambda f: f.cancelled() or f.exception())
+
+    if not _reserved_request_ids:
+        await asyncio.shield(refill)
+
+
+def _flush_request_log(batch: List[Tuple[int, Dict[str, Any], bool]]) -> None:
+    """
+    Write queued (id, values, is_insert) items. Inserts go first, an update is always
+    queued after the insert for its record.
+    """
+    _requests_repo.bulk_write(
+        inserts=[values for _, values, is_insert in batch if is_insert],
+        updates=[(id_, values) for id_, values, is_insert in batch if not is_insert],
+    )
+
+
+request_log_queue = WriteBehindQueue(_flush_request_log, name="request_log")
+
 
 class RequestSource(Enum):
     HOMESERVER = "homeserver"
@@ -41,6 +117,24 @@ class RequestContext:
     and provides convenience methods to mark forwarded/handled/unhandled and to attach responses.
     """
 
+    # One context is built per request, slots keep it small and attribute access cheap
+    __slots__ = (
+        "request",
+        "source",
+        "bridge_manager_config",
+        "bridge",
+        "bridge_discovery_method",
+        "homeserver",
+        "body_json",
+        "body_bytes",
+        "headers",
+        "query_params",
+        "path",
+        "transaction_id",
+        "path_match",
+        "request_id",
+    )
+
     def __init__(
         self,
         request: Request,
@@ -51,9 +145,12 @@ class RequestContext:
         bridge_discovery_method: Optional[BridgeResolutionMethod] = None,
         homeserver: Optional[Any] = None,
         body_json: Optional[Dict[str, Any]] = None,
+        body_bytes: Optional[bytes] = None,
         headers: Optional[Dict[str, Any]] = None,
         query_params: Optional[Dict[str, Any]] = None,
+        path: Optional[str] = None,
         transaction_id: Optional[str] = None,
+        path_match: Optional[re.Match] = None,
     ):
 
         self.request = request
@@ -65,12 +162,17 @@ class RequestContext:
         self.homeserver = homeserver
 
         self.body_json = body_json
+        # raw JSON body as received, so unmodified bodies can be forwarded without re-serializing
+        self.body_bytes = body_bytes
         self.headers = headers
         self.query_params = query_params
+        # resolved once here so handlers don't each look it up in path_params
+        self.path = path if path is not None else request.path_params.get("path", "")
         self.transaction_id = transaction_id
+        # username_in_path_re matched against path, for homeserver requests only
+        self.path_match = path_match
 
-        request_model = self.log_inbound_request()
-        self.request_id = request_model.id
+        self.request_id = self.log_inbound_request()
 
     @classmethod
     async def create(
@@ -80,11 +182,21 @@ class RequestContext:
         source: str,
     ):
 
-        # read body
-        body = await request.body()
-        body_json = json.loads(body) if body else None
+        # read body, non-JSON bodies (e.g. media uploads) are left unread so they can be streamed
+        content_type = request.headers.get("content-type", "")
+        body = None
+        if content_type and "json" not in content_type:
+            body_json = None
+        else:
+            body = await request.body()
+            body_json = orjson.loads(body) if body else None
+
+            # kept on the request so code that runs without a context (e.g. when bridge
+            # resolution below fails) can reuse the parsed body instead of parsing it again
+            request.state.body_json = body_json
 
         # read path, headers and query params
+        # headers is owned by this request's context, handlers may modify it in place
         path = request.path_params.get("path", "")
         headers = dict(request.headers)
         query_params = dict(request.query_params)
@@ -96,16 +208,29 @@ class RequestContext:
             raise ValueError("source must be either 'homeserver' or 'bridge'")
 
         # Use BridgeResolver to discover bridge
-        resolver = BridgeResolver(bridge_manager_config)
+        resolver = _bridge_resolvers.get(bridge_manager_config)
+        if resolver is None:
+            resolver = _bridge_resolvers[bridge_manager_config] = BridgeResolver(
+                bridge_manager_config
+            )
+        # matched once here for both bridge resolution and the users handler
+        path_match = None
+        if source_enum == RequestSource.HOMESERVER:
+            path_match = bridge_manager_config.username_in_path_re.match(path)
+
         bridge, bridge_discovery_method = resolver.resolve(
             source=source_enum,
             headers=headers,
             path=path,
             body_json=body_json,
+            path_match=path_match,
         )
 
         homeserver = cls.discover_homeserver(headers=headers, source_enum=source_enum)
 
+        # make sure __init__ can take a request id without a database round trip
+        await _refill_request_ids()
+
         # create instance of the request context
         inst = cls(
             request=request,
@@ -115,12 +240,80 @@ class RequestContext:
             bridge_discovery_method=bridge_discovery_method,
             homeserver=homeserver,
             body_json=body_json,
+            body_bytes=body,
             headers=headers,
             query_params=query_params,
+            path=path,
+            path_match=path_match,
         )
 
         return inst
 
+    @classmethod
+    def derive(
+        cls,
+        parent: "RequestContext",
+        method: str,
+        path: str,
+        query_params: Dict[str, Any],
+        headers: Dict[str, Any],
+        body_json: Optional[Any] = None,
+    ):
+        """
+        Build the context for a sub-request made on behalf of `parent`'s caller, e.g. one
+        item of a batch. It keeps the parent's bridge and homeserver, gets its own
+        request log entry and is routed like a request received directly.
+
+        Args:
+            parent: context of the request the sub-request was received in
+            path: path relative to the catchall, without a query string
+            headers: headers for the sub-request, hop-by-hop headers already removed
+        """
+        body = orjson.dumps(body_json) if body_json is not None else None
+        headers = dict(headers)
+        if body is not None:
+            headers["content-type"] = "application/json"
+
+        # handlers read the body from the context, but streaming ones (e.g. uploads)
+        # read it from the request, so the request is given the sub-request's body.
+        # After that it reports the parent's disconnects.
+        body_sent = False
+
+        async def receive():
+            nonlocal body_sent
+            if not body_sent:
+                body_sent = True
+                return {"type": "http.request", "body": body or b"", "more_body": False}
+            return await parent.request.receive()
+
+        scope = {
+            **parent.request.scope,
+            "method": method,
+            "path": f"/{parent.source.value}/{path}",
+            "raw_path": f"/{parent.source.value}/{path}".encode("utf-8"),
+            "query_string": urlencode(query_params).encode("latin-1"),
+            "headers": [
+                (k.lower().encode("latin-1"), str(v).encode("latin-1"))
+                for k, v in headers.items()
+            ],
+            "path_params": {"path": path},
+            "state": {},
+        }
+
+        return cls(
+            request=Request(scope, receive=receive),
+            source=parent.source,
+            bridge_manager_config=parent.bridge_manager_config,
+            bridge=parent.bridge,
+            bridge_discovery_method=parent.bridge_discovery_method,
+            homeserver=parent.homeserver,
+            body_json=body_json,
+            body_bytes=body,
+            headers=headers,
+            query_params=dict(query_params),
+            path=path,
+        )
+
     def log_inbound_request(self):
         """
         Serialize request to be stored in the database. Only keeping the important bits to keep lean.
@@ -130,86 +323,110 @@ class RequestContext:
 
         Args:
             request (Request): Original request
-        """
-        requests_repo = RequestsRepository()
-
-        data = json.dumps(
-            {
-                "method": self.request.method,
-                "url": self.request.url._url,
-                "path": self.request.path_params.get("path", ""),
-                "query_params": self.query_params,
-                "headers": self.headers,
-                "body_json": self.body_json,
-            }
-        )
 
-        # create a request record in the database
-        request_model = requests_repo.create(
-            inbound_at=datetime.now(timezone.utc),
-            source=self.source.value,
-            bridge_id=self.bridge.bridge_id,
-            homeserver_id=self.homeserver.id,
-            method=self.request.method,
-            path=self.request.path_params.get("path", ""),
-            inbound_request=data,
+        Returns:
+            the id the request record will be written with
+        """
+        # the JSON column serializes the dict itself. body_bytes already parsed as JSON
+        # in create(), so it is embedded verbatim rather than serialized again
+        data = {
+            "method": self.request.method,
+            "url": self.request.url._url,
+            "path": self.path,
+            # copied, handlers modify the context's headers before the record is written
+            "query_params": (
+                dict(self.query_params) if self.query_params is not None else None
+            ),
+            "headers": dict(self.headers) if self.headers is not None else None,
+            "body_json": orjson.Fragment(self.body_bytes) if self.body_bytes else None,
+        }
+
+        # queue a request record for the database, its id is known before it's written
+        request_id = _next_request_id()
+        request_log_queue.put(
+            (
+                request_id,
+                {
+                    "id": request_id,
+                    "inbound_at": datetime.now(timezone.utc),
+                    "source": self.source.value,
+                    "bridge_id": self.bridge.bridge_id,
+                    "homeserver_id": self.homeserver.id,
+                    "method": self.request.method,
+                    "path": self.path,
+                    "inbound_request": data,
+                },
+                True,
+            )
         )
 
-        return request_model
+        return request_id
 
-    def log_outbound_request(self, request):
+    def log_outbound_request(self, request, include_body: bool = True):
         """
         Log the request being sent to the destination
 
         Args:
             request (_type_): _description_
+            include_body (bool): False for streamed requests, whose body can't be read
         """
 
-        requests_repo = RequestsRepository()
-
-        body = request.content.decode("utf-8")
-        body_json = json.loads(body) if body else None
-        data = json.dumps(
-            {
-                "method": request.method,
-                "url": str(request.url),
-                "path": request.url.path,
-                "query_params": request.url.query.decode("utf-8"),
-                "headers": dict(request.headers),
-                "body_json": body_json,
-            }
-        )
-
-        requests_repo.update(
-            id_=self.request_id,
-            outbound_at=datetime.now(timezone.utc),
-            outbound_request=data,
+        # outgoing JSON bodies are either the inbound bytes (already parsed in create())
+        # or serialized by orjson, so they are embedded verbatim instead of re-parsed
+        body_json = None
+        if include_body and "json" in request.headers.get("content-type", ""):
+            body = request.content
+            body_json = orjson.Fragment(body) if body else None
+        data = {
+            "method": request.method,
+            "url": str(request.url),
+            "path": request.url.path,
+            "query_params": request.url.query.decode("utf-8"),
+            "headers": dict(request.headers),
+            "body_json": body_json,
+        }
+
+        request_log_queue.put(
+            (
+                self.request_id,
+                {"outbound_at": datetime.now(timezone.utc), "outbound_request": data},
+                False,
+            )
         )
 
-    def log_response(self, response):
-
-        requests_repo = RequestsRepository()
+    def log_response(self, response, include_body: bool = True):
 
         # Handle both httpx.Response and FastAPI JSONResponse objects
-        if hasattr(response, "content"):
-            # httpx.Response
-            content = response.content.decode("utf-8")
-            content = json.loads(content) if content else None
+        if not include_body:
+            # streamed response, the body hasn't been read
+            content = None
+            status_code = getattr(response, "status_code", None)
+        elif hasattr(response, "content"):
+            # httpx.Response, only JSON bodies are stored so anything else
+            # (e.g. an HTML error page from a proxy) isn't parsed at all
+            content = None
+            if "json" in response.headers.get("content-type", ""):
+                body = response.content
+                content = orjson.loads(body) if body else None
             status_code = response.status_code
         elif hasattr(response, "body"):
-            # FastAPI JSONResponse
-            body = response.body
-            content = json.loads(body.decode("utf-8")) if body else None
+            # FastAPI Response, which may pass an upstream body of any type through
+            content = None
+            if "json" in response.headers.get("content-type", ""):
+                body = response.body
+                content = orjson.loads(body) if body else None
             status_code = response.status_code
         else:
             # Unknown response type, try to extract what we can
             content = None
             status_code = getattr(response, "status_code", None)
 
-        data = json.dumps(content) if content else None
-
-        requests_repo.update(
-            id_=self.request_id, response=data, response_status=status_code
+        request_log_queue.put(
+            (
+                self.request_id,
+                {"response": content or None, "response_status": status_code},
+                False,
+            )
         )
 
     @classmethod
@@ -225,21 +442,20 @@ class RequestContext:
         If the request originates from a bridge then I have to search the bridge bots table to find the associated bridge.
         """
 
-        homeserver_repo = HomeserversRepository()
         bridges_repo = BridgesRepository()
 
         homeserver = None
 
         if source_enum == RequestSource.HOMESERVER:
             hs_token = cls._extract_auth_token_from_headers(headers)
-            homeserver = homeserver_repo.get_by_hs_token(hs_token)
+            homeserver = _homeservers_repo.get_by_hs_token(hs_token)
 
         if source_enum == RequestSource.BRIDGE:
             # search the bridge register
             as_token = cls._extract_auth_token_from_headers(headers)
             bridge_model = bridges_repo.get_by_as_token(as_token)
             hs_token = bridge_model.hs_token
-            homeserver = homeserver_repo.get_by_hs_token(hs_token)
+            homeserver = _homeservers_repo.get_by_hs_token(hs_token)
 
         if not homeserver:
             raise ValueError("Homeserver not found for the given request.")
@@ -277,15 +493,23 @@ class RequestContext:
             e.g. @_bridge_manager__whatsapp_1__whatsappbot:matrix.localhost.me -> @whatsappbot:matrix.localhost.me
             """
 
-            username_pattern = rf"@(?P<username>[^:]+):(?P<homeserver>[^\s/]+)"
-            if not (match := re.match(username_pattern, username)):
+            # split "@user:host" directly, same result as matching
+            # @(?P<username>[^:]+):(?P<homeserver>[^\s/]+) against the start
+            bridge_username, sep, rest = username[1:].partition(":")
+            homeserver = rest.split("/", 1)[0]
+            if (
+                not username.startswith("@")
+                or not bridge_username
+                or not sep
+                or not homeserver
+                or homeserver[0].isspace()
+            ):
                 raise ValueError("username pattern not recognised")
+            homeserver = homeserver.split(None, 1)[0]
 
             namespace = self.bridge_manager_config.NAMESPACE
             bridge_type = self.bridge.bridge_type
             bridge_id = self.bridge.bridge_id
-            bridge_username = match.group("username")
-            homeserver = match.group("homeserver")
 
             return (
                 f"@{namespace}{bridge_type}_{bridge_id}__{bridge_username}:{homeserver}"
@@ -298,55 +522,14 @@ class RequestContext:
             e.g. @whatsappbot:matrix.localhost.me -> @_bridge_manager__whatsapp_1__whatsappbot:matrix.localhost.me
             """
 
-            username_pattern = self.bridge_manager_config.username_regex
+            config = self.bridge_manager_config
 
-            if not (match := re.match(username_pattern, username)):
+            # anything outside the bridge manager's namespace can't match
+            if not username.startswith(f"@{config.NAMESPACE}") or not (
+                match := config.username_re.match(username)
+            ):
                 raise ValueError("username pattern not recognised")
 
-            bridge_username = match.group("bridge_username")
-            homeserver = match.group("homeserver")
+            _, _, bridge_username, homeserver = match.groups()
 
             return f"@{bridge_username}:{homeserver}"
-
-    def rewrite_usernames_in_body(self, to: str) -> Optional[Dict[str, Any]]:
-        """
-        Searches through the body and replaces any string that resembles a username into the equivilent username for the homeserver/bridge
-
-        Args:
-            to (str): homeserver or bridge
-        """
-
-        if not to in ["bridge", "homeserver"]:
-            raise ValueError("to can only be bridge or homeserver")
-
-        if not self.body_json:
-            return None
-
-        homeserver_username_pattern = self.bridge_manager_config.username_regex
-        bridge_username_pattern = r"@(?P<username>[^:]+):(?P<homeserver>[^\s/]+)"
-
-        def replace(obj, to):
-
-            if isinstance(obj, dict):
-
-                for k, v in list(obj.items()):
-
-                    if isinstance(v, str):
-
-                        if re.match(homeserver_username_pattern, v) or re.match(
-                            bridge_username_pattern, v
-                        ):
-                            obj[k] = self.translate_username(v, to=to)
-
-                    else:
-                        obj[k] = replace(v)
-
-                return obj
-
-            elif isinstance(obj, list):
-                return [replace(i) for i in obj]
-
-            else:
-                return obj
-
-        return replace(self.body_json.copy())
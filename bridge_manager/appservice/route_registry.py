@@ -8,7 +8,7 @@ with support for exact matches, regex patterns, and fallback handlers.
 from __future__ import annotations
 import re
 from typing import Callable, Optional, List, Tuple, Dict, Any, TYPE_CHECKING
-from dataclasses import dataclass
+from dataclasses import dataclass, field
 from enum import Enum
 from logger import Logger
 
@@ -43,19 +43,25 @@ class Route:
         handler: Async function to call when route matches
         match_type: How to match the pattern (exact, regex, prefix)
         description: Optional description for documentation/debugging
+        compiled: Compiled regex for REGEX routes, built once at registration
     """
 
     pattern: str
     handler: Callable
     match_type: RouteMatchType
     description: Optional[str] = None
+    compiled: Optional[re.Pattern] = field(default=None, repr=False, compare=False)
+
+    def __post_init__(self):
+        if self.match_type == RouteMatchType.REGEX and self.compiled is None:
+            self.compiled = re.compile(self.pattern)
 
     def matches(self, path: str) -> bool:
         """Check if this route matches the given path"""
         if self.match_type == RouteMatchType.EXACT:
             return path == self.pattern
         elif self.match_type == RouteMatchType.REGEX:
-            return re.match(self.pattern, path) is not None
+            return self.compiled.match(path) is not None
         elif self.match_type == RouteMatchType.PREFIX:
             return path.startswith(self.pattern)
         return False
@@ -70,7 +76,10 @@ class RouteRegistry:
     Registry for managing route → handler mappings.
 
     Allows bridge services to register endpoints with exact strings or regex patterns.
-    Routes are matched in registration order, allowing explicit prioritization.
+    Exact routes are resolved first with a dict lookup; regex and prefix routes
+    are then matched in registration order, allowing explicit prioritization.
+    Prefix routes are indexed by prefix, so finding them is a dict lookup per
+    distinct prefix length rather than a startswith per route.
 
     Example:
         registry = RouteRegistry()
@@ -90,8 +99,50 @@ class RouteRegistry:
             fallback_handler: Optional handler to call when no routes match
         """
         self._routes: List[Route] = []
+        self._exact_routes: Dict[str, Route] = {}
+        # non-exact routes keyed for lookup, with their registration position so
+        # the ordering between regex and prefix routes is preserved
+        self._prefix_routes: Dict[str, Tuple[int, Route]] = {}
+        self._prefix_lengths: List[int] = []
+        self._regex_routes: List[Tuple[int, Route]] = []
         self._fallback_handler = fallback_handler
 
+    def _add(self, route: Route) -> None:
+        """Append a route and add it to the lookup index for its match type"""
+        position = len(self._routes)
+        self._routes.append(route)
+
+        # first registration wins, same as ordered matching
+        if route.match_type == RouteMatchType.EXACT:
+            self._exact_routes.setdefault(route.pattern, route)
+        elif route.match_type == RouteMatchType.REGEX:
+            self._regex_routes.append((position, route))
+        elif route.match_type == RouteMatchType.PREFIX:
+            if route.pattern not in self._prefix_routes:
+                self._prefix_routes[route.pattern] = (position, route)
+                if len(route.pattern) not in self._prefix_lengths:
+                    self._prefix_lengths.append(len(route.pattern))
+                    self._prefix_lengths.sort()
+
+    def _clear(self) -> None:
+        """Empty the route list and every lookup index"""
+        self._routes.clear()
+        self._exact_routes.clear()
+        self._prefix_routes.clear()
+        self._prefix_lengths.clear()
+        self._regex_routes.clear()
+
+    def _match_prefix(self, path: str) -> Optional[Tuple[int, Route]]:
+        """Return the earliest registered prefix route matching path, if any"""
+        best = None
+        for length in self._prefix_lengths:
+            if length > len(path):
+                break
+            entry = self._prefix_routes.get(path[:length])
+            if entry and (best is None or entry[0] < best[0]):
+                best = entry
+        return best
+
     def add_exact(
         self, path: str, handler: Callable, description: Optional[str] = None
     ) -> None:
@@ -109,7 +160,7 @@ class RouteRegistry:
             match_type=RouteMatchType.EXACT,
             description=description,
         )
-        self._routes.append(route)
+        self._add(route)
         logger.debug(f"Registered exact route: {path}")
 
     def add_regex(
@@ -126,9 +177,9 @@ class RouteRegistry:
         Raises:
             ValueError: If pattern is not a valid regex
         """
-        # Validate regex pattern
+        # Validate and compile the regex pattern once
         try:
-            re.compile(pattern)
+            compiled = re.compile(pattern)
         except re.error as e:
             raise ValueError(f"Invalid regex pattern '{pattern}': {e}")
 
@@ -137,8 +188,9 @@ class RouteRegistry:
             handler=handler,
             match_type=RouteMatchType.REGEX,
             description=description,
+            compiled=compiled,
         )
-        self._routes.append(route)
+        self._add(route)
         logger.debug(f"Registered regex route: {pattern}")
 
     def add_prefix(
@@ -158,7 +210,7 @@ class RouteRegistry:
             match_type=RouteMatchType.PREFIX,
             description=description,
         )
-        self._routes.append(route)
+        self._add(route)
         logger.debug(f"Registered prefix route: {prefix}")
 
     def set_fallback(self, handler: Callable) -> None:
@@ -175,8 +227,9 @@ class RouteRegistry:
         """
         Find the first handler that matches the given path.
 
-        Routes are checked in registration order, so register more specific
-        routes before more general ones.
+        Exact routes are looked up first. Remaining routes are checked in
+        registration order, so register more specific routes before more
+        general ones.
 
         Args:
             path: Request path to match
@@ -184,12 +237,26 @@ class RouteRegistry:
         Returns:
             Handler function if a route matches, None otherwise
         """
-        for route in self._routes:
-            if route.matches(path):
-                logger.debug(f"Path '{path}' matched {route}")
+        route = self._exact_routes.get(path)
+        if route:
+            logger.debug("Path '%s' matched %s", path, route)
+            return route.handler
+
+        # a regex route only wins if it was registered before the matching prefix
+        prefix_match = self._match_prefix(path)
+        for position, route in self._regex_routes:
+            if prefix_match and position > prefix_match[0]:
+                break
+            if route.compiled.match(path) is not None:
+                logger.debug("Path '%s' matched %s", path, route)
                 return route.handler
 
-        logger.debug(f"No route matched path '{path}'")
+        if prefix_match:
+            route = prefix_match[1]
+            logger.debug("Path '%s' matched %s", path, route)
+            return route.handler
+
+        logger.debug("No route matched path '%s'", path)
         return None
 
     def match_or_fallback(self, path: str) -> Optional[Callable]:
@@ -210,7 +277,7 @@ class RouteRegistry:
             return handler
 
         if self._fallback_handler:
-            logger.debug(f"Using fallback handler for path '{path}'")
+            logger.debug("Using fallback handler for path '%s'", path)
             return self._fallback_handler
 
         raise RouteNotFoundError(f"No route or fallback handler for path: {path}")
@@ -221,7 +288,7 @@ class RouteRegistry:
 
     def clear(self) -> None:
         """Remove all registered routes"""
-        self._routes.clear()
+        self._clear()
         logger.debug("Cleared all routes")
 
     def remove_pattern(self, pattern: str) -> bool:
@@ -234,9 +301,14 @@ class RouteRegistry:
         Returns:
             True if a route was removed, False otherwise
         """
-        original_len = len(self._routes)
-        self._routes = [r for r in self._routes if r.pattern != pattern]
-        removed = len(self._routes) < original_len
+        remaining = [r for r in self._routes if r.pattern != pattern]
+        removed = len(remaining) < len(self._routes)
+
+        # positions shift, so rebuild the lookup indexes from the remaining routes
+        if removed:
+            self._clear()
+            for route in remaining:
+                self._add(route)
 
         if removed:
             logger.debug(f"Removed route with pattern '{pattern}'")
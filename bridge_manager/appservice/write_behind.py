@@ -0,0 +1,149 @@
+"""Write-behind queue for database writes that don't need to block a request.
+
+Items are buffered in memory and flushed in batches by a background task,
+keeping synchronous DB round trips off the request path.
+"""
+
+import asyncio
+from typing import Any, Callable, List, Optional
+
+from logger import Logger
+
+logger = Logger().get_logger(__name__)
+
+# wakes a writer blocked on an empty queue when the queue is stopped
+_STOP = object()
+
+# a warning is logged for the first dropped item and then once per this many drops
+_DROP_WARN_EVERY = 1000
+
+
+def _in_loop(loop: asyncio.AbstractEventLoop) -> bool:
+    """True when called from the thread running `loop`"""
+    try:
+        return asyncio.get_running_loop() is loop
+    except RuntimeError:
+        return False
+
+
+class WriteBehindQueue:
+    """
+    Buffers items and hands them to `flush` in batches.
+
+    `flush` is a synchronous callable (typically a repository bulk method)
+    and is run in a worker thread so it doesn't block the event loop.
+
+    Batches are flushed back to back while items are queued; the writer only
+    waits `interval` (to let the next batch build up) once the queue is empty.
+    At most `maxsize` items are buffered. When the queue is full, put() drops
+    the item and logs a warning rather than blocking the caller: the writes
+    queued here are logging and cache-like data whose loss is preferable to
+    stalling requests while the database is slow or down.
+    """
+
+    def __init__(
+        self,
+        flush: Callable[[List[Any]], Any],
+        name: str,
+        max_batch: int = 500,
+        interval: float = 1.0,
+        maxsize: int = 100_000,
+    ):
+        self.flush = flush
+        self.name = name
+        self.max_batch = max_batch
+        self.interval = interval
+        # items dropped because the queue was full
+        self.dropped = 0
+
+        self._queue: asyncio.Queue = asyncio.Queue(maxsize=maxsize)
+        self._task: Optional[asyncio.Task] = None
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._stopping = asyncio.Event()
+
+    def put(self, item: Any) -> None:
+        """
+        Queue an item to be written on the next flush. Safe to call from a worker
+        thread (e.g. code run with asyncio.to_thread) once the queue is started.
+        Never blocks, the item is dropped if the queue is full.
+        """
+        loop = self._loop
+        if loop is not None and not _in_loop(loop):
+            loop.call_soon_threadsafe(self._put_nowait, item)
+        else:
+            self._put_nowait(item)
+
+    def _put_nowait(self, item: Any) -> None:
+        try:
+            self._queue.put_nowait(item)
+        except asyncio.QueueFull:
+            self.dropped += 1
+            if self.dropped % _DROP_WARN_EVERY == 1:
+                logger.warning(
+                    f"{self.name}: queue full ({self._queue.maxsize} items), "
+                    f"dropped {self.dropped} items so far"
+                )
+
+    def start(self) -> None:
+        """Start the background flush task. Must be called from a running loop."""
+        if self._task is None or self._task.done():
+            self._loop = asyncio.get_running_loop()
+            self._stopping.clear()
+            self._task = asyncio.create_task(self._run())
+            self._task.add_done_callback(self._on_task_done)
+
+    def _on_task_done(self, task: asyncio.Task) -> None:
+        # surface a crashed writer rather than letting writes silently pile up
+        if not task.cancelled() and task.exception() is not None:
+            logger.error(f"{self.name}: writer task stopped: {task.exception()!r}")
+
+    async def stop(self) -> None:
+        """
+        Stop the background task and flush anything still queued. The writer is
+        signalled rather than cancelled so a batch it is flushing isn't lost.
+        """
+        if self._task is not None:
+            self._stopping.set()
+            try:
+                self._queue.put_nowait(_STOP)
+            except asyncio.QueueFull:
+                # the writer isn't blocked on an empty queue, it sees _stopping
+                pass
+            try:
+                await self._task
+            except Exception:
+                # already logged by _on_task_done
+                pass
+            self._task = None
+
+        while not self._queue.empty():
+            await self._flush_batch(self._drain())
+
+    def _drain(self, first: Any = _STOP) -> List[Any]:
+        batch = [] if first is _STOP else [first]
+        while len(batch) < self.max_batch and not self._queue.empty():
+            item = self._queue.get_nowait()
+            if item is not _STOP:
+                batch.append(item)
+        return batch
+
+    async def _flush_batch(self, batch: List[Any]) -> None:
+        if not batch:
+            return
+        try:
+            await asyncio.to_thread(self.flush, batch)
+            logger.debug(f"{self.name}: flushed {len(batch)} items")
+        except Exception as e:
+            logger.warning(f"{self.name}: failed to flush {len(batch)} items: {e}")
+
+    async def _run(self) -> None:
+        while not self._stopping.is_set():
+            first = await self._queue.get()
+            await self._flush_batch(self._drain(first))
+            if not self._queue.empty():
+                # keep up with a backlog rather than flushing max_batch per interval
+                continue
+            try:
+                await asyncio.wait_for(self._stopping.wait(), self.interval)
+            except asyncio.TimeoutError:
+                pass
@@ -1,3 +1,4 @@
+import time
 from datetime import datetime, timezone
 
 from .config import BridgeManagerConfig
@@ -9,6 +10,15 @@ from .database.repositories import (
 )
 from .database.models import Bridges
 
+# Repositories hold no per-request state (each call opens its own session), so share one of each
+_requests_repo = RequestsRepository()
+_transactions_repo = TransactionMappingsRepository()
+_room_mappings_repo = RoomBridgeMappingRepository()
+
+# How long a resolved bridge service is reused before it is looked up again, so changes
+# made by another process (e.g. the orchestrator) are picked up
+_BRIDGE_CACHE_TTL = 60.0
+
 
 class BridgeRegistry:
     """Registry for managing bridge instances with caching for performance."""
@@ -16,9 +26,14 @@ class BridgeRegistry:
     def __init__(self, bridge_manager_config: BridgeManagerConfig):
         self.bridge_manager_config = bridge_manager_config
         self.bridges_repository = BridgesRepository()
-        # Cache to avoid repeated DB lookups
+        # Cache to avoid repeated DB lookups, get_bridge args -> (expires_at, bridge service)
         self._bridge_cache = {}
 
+    def clear_cache(self):
+        """Drop cached bridge lookups, called whenever bridges are added or removed"""
+        self._bridge_cache.clear()
+        self.bridges_repository.clear_cache()
+
     # TODO: Register bridge (the orchestrator will register the bridge instance)
     def register_bridge(
         self,
@@ -33,6 +48,8 @@ class BridgeRegistry:
         port,
         owner_matrix_username,
     ):
+        self.clear_cache()
+
         # register the bridge in the database
         return self.bridges_repository.create(
             orchestrator_id=orchestrator_id,
@@ -54,6 +71,35 @@ class BridgeRegistry:
         orchestrator_id: str = None,
         owner_username: str = None,
         service: str = None,
+    ):
+        # Building a bridge service costs several DB queries, and the same few bridges
+        # are looked up on every request, so services are reused for _BRIDGE_CACHE_TTL
+        cache_key = (as_token, bridge_id, orchestrator_id, owner_username, service)
+        cached = self._bridge_cache.get(cache_key)
+        if cached is not None and cached[0] > time.monotonic():
+            return cached[1]
+
+        bridge_service = self._lookup_bridge(
+            as_token=as_token,
+            bridge_id=bridge_id,
+            orchestrator_id=orchestrator_id,
+            owner_username=owner_username,
+            service=service,
+        )
+        if bridge_service is not None:
+            self._bridge_cache[cache_key] = (
+                time.monotonic() + _BRIDGE_CACHE_TTL,
+                bridge_service,
+            )
+        return bridge_service
+
+    def _lookup_bridge(
+        self,
+        as_token: str = None,
+        bridge_id: int = None,
+        orchestrator_id: str = None,
+        owner_username: str = None,
+        service: str = None,
     ):
         bridge = None
 
@@ -99,16 +145,14 @@ class BridgeRegistry:
             bridge_id: The database ID of the bridge to delete
         """
 
+        self.clear_cache()
+
         # Soft delete the bridge
         self.bridges_repository.update(
             id_=bridge_id, deleted_at=datetime.now(timezone.utc)
         )
 
         # Hard delete related records using repository methods
-        requests_repo = RequestsRepository()
-        transactions_repo = TransactionMappingsRepository()
-        room_mappings_repo = RoomBridgeMappingRepository()
-
-        requests_repo.delete_by_bridge_id(bridge_id)
-        transactions_repo.delete_by_bridge_id(bridge_id)
-        room_mappings_repo.delete_by_bridge_id(bridge_id)
+        _requests_repo.delete_by_bridge_id(bridge_id)
+        _transactions_repo.delete_by_bridge_id(bridge_id)
+        _room_mappings_repo.delete_by_bridge_id(bridge_id)
@@ -1,4 +1,6 @@
 import os
+import re
+from functools import cached_property
 
 from dotenv import load_dotenv
 
@@ -28,3 +30,13 @@ class BridgeManagerConfig:
     @property
     def username_regex(self):
         return rf"@{self.NAMESPACE}(?P<bridge_type>[^_]+)_(?P<bridge_id>[^_]+)__(?P<bridge_username>[^:]+):(?P<homeserver>[^\s/]+)"
+
+    @cached_property
+    def username_re(self) -> re.Pattern:
+        """username_regex compiled once per config instance"""
+        return re.compile(self.username_regex)
+
+    @cached_property
+    def username_in_path_re(self) -> re.Pattern:
+        """Matches a path ending in a bridge manager username, e.g. .../users/@..."""
+        return re.compile(rf"(?P<endpoint>.*)/{self.username_regex}")
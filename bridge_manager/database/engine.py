@@ -1,9 +1,15 @@
+import orjson
 from sqlalchemy.engine import URL
 from sqlalchemy import create_engine
 
 from bridge_manager.config import DatabaseConfig
 
 
+def _json_serializer(obj) -> str:
+    """Serializer for JSON columns, orjson also embeds orjson.Fragment values as-is"""
+    return orjson.dumps(obj).decode("utf-8")
+
+
 class DatabaseEngine:
     """
     Singleton class for the matrix database engine
@@ -22,7 +28,9 @@ class DatabaseEngine:
                     username=DatabaseConfig.USERNAME,
                     password=DatabaseConfig.PASSWORD,
                     database=DatabaseConfig.DATABASE,
-                )
+                ),
+                json_serializer=_json_serializer,
+                json_deserializer=orjson.loads,
             )
 
         return cls._engine
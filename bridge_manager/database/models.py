@@ -5,14 +5,8 @@ from sqlalchemy import func
 from sqlalchemy import Boolean, LargeBinary, JSON, String, Index, text
 import uuid
 
-from .engine import DatabaseEngine
-
 SCHEMA_NAME = "bridge_manager"
 
-with DatabaseEngine().connect() as conn:
-    conn.execute(text(f"CREATE SCHEMA IF NOT EXISTS {SCHEMA_NAME}"))
-    conn.commit()
-
 
 class Base(DeclarativeBase):
     __table_args__ = {"schema": "bridge_manager"}
@@ -114,3 +108,11 @@ class RoomBridgeMapping(Base):
     bridge_id = Column(Integer, ForeignKey("bridge_manager.bridges.id"), nullable=False)
     first_seen_at = Column(DateTime, nullable=False, server_default=func.now())
     last_seen_at = Column(DateTime, nullable=False, server_default=func.now())
+
+
+def create_schema(engine) -> None:
+    """Create the bridge manager schema and its tables if they don't exist yet"""
+    with engine.connect() as conn:
+        conn.execute(text(f"CREATE SCHEMA IF NOT EXISTS {SCHEMA_NAME}"))
+        conn.commit()
+    Base.metadata.create_all(engine)
@@ -1,8 +1,12 @@
 from datetime import datetime, UTC
 from abc import ABC, abstractmethod
+import threading
+import time
+from typing import Any, Dict, List, Tuple
 
 from sqlalchemy.orm import sessionmaker
-from sqlalchemy import select, and_, insert
+from sqlalchemy import select, and_, insert, func, update
+from sqlalchemy.dialects.postgresql import insert as pg_insert
 
 from .models import (
     Bridges,
@@ -12,16 +16,43 @@ from .models import (
     TransactionMappings,
     Request,
     RoomBridgeMapping,
+    create_schema,
 )
 from .engine import DatabaseEngine
 
-Base.metadata.create_all(DatabaseEngine())
+# How long a cached bridge row is reused, same as the bridge registry's service cache.
+# Registries (and their repositories) live for the whole process, so without expiry a
+# bridge changed by another process would never be seen again
+_BRIDGE_CACHE_TTL = 60.0
+
+_session_factory = None
+_session_factory_lock = threading.Lock()
+
+
+def _default_session_factory() -> sessionmaker:
+    """
+    Session factory bound to the shared engine. The schema is set up on first use
+    rather than at import, so the repositories can be imported without a database.
+    """
+    global _session_factory
+    with _session_factory_lock:
+        if _session_factory is None:
+            engine = DatabaseEngine()
+            create_schema(engine)
+            _session_factory = sessionmaker(bind=engine)
+    return _session_factory
 
 
 class BaseRepository(ABC):
     def __init__(self, session_factory=None):
         # Allow dependency injection for easier testing
-        self.Session = session_factory or sessionmaker(bind=DatabaseEngine())
+        self._session_factory = session_factory
+
+    @property
+    def Session(self) -> sessionmaker:
+        if self._session_factory is None:
+            self._session_factory = _default_session_factory()
+        return self._session_factory
 
     @property
     @abstractmethod
@@ -66,8 +97,22 @@ class BridgesRepository(BaseRepository):
 
     def __init__(self, *args, **kwargs):
         super().__init__(*args, **kwargs)
+        # cache key -> (expires_at, bridge)
         self._cache = {}
 
+    def clear_cache(self):
+        """Drop cached bridge lookups so the next lookup reads the database"""
+        self._cache.clear()
+
+    def _cached(self, cache_key: str):
+        cached = self._cache.get(cache_key)
+        if cached is not None and cached[0] > time.monotonic():
+            return cached[1]
+        return None
+
+    def _store(self, cache_key: str, bridge) -> None:
+        self._cache[cache_key] = (time.monotonic() + _BRIDGE_CACHE_TTL, bridge)
+
     def get_all(self):
         with self.Session() as session:
             statement = select(self.model)
@@ -82,14 +127,15 @@ class BridgesRepository(BaseRepository):
 
     def get_by_as_token(self, as_token: str):
         cache_key = f"as_token:{as_token}"
-        if cache_key in self._cache:
-            return self._cache[cache_key]
+        cached = self._cached(cache_key)
+        if cached is not None:
+            return cached
 
         with self.Session() as session:
             statement = select(self.model).where(self.model.as_token == as_token)
             result = session.execute(statement).scalar_one_or_none()
             if result:
-                self._cache[cache_key] = result
+                self._store(cache_key, result)
             return result
 
     def get_by_owner_username_and_service(
@@ -113,8 +159,9 @@ class BridgesRepository(BaseRepository):
 
     def get_by_orchestrator_id(self, orchestrator_id: str):
         cache_key = f"orchestrator_id:{orchestrator_id}"
-        if cache_key in self._cache:
-            return self._cache[cache_key]
+        cached = self._cached(cache_key)
+        if cached is not None:
+            return cached
 
         with self.Session() as session:
             statement = select(self.model).where(
@@ -122,7 +169,7 @@ class BridgesRepository(BaseRepository):
             )
             result = session.execute(statement).scalar_one_or_none()
             if result:
-                self._cache[cache_key] = result
+                self._store(cache_key, result)
             return result
 
 
@@ -150,6 +197,43 @@ class RequestsRepository(BaseRepository):
             statement = select(self.model)
             return session.execute(statement).scalars().all()
 
+    def reserve_ids(self, count: int) -> List[int]:
+        """
+        Take `count` ids from the table's id sequence in one round trip, so records
+        can be given their id before they are inserted.
+        """
+        sequence = func.pg_get_serial_sequence(self.model.__table__.fullname, "id")
+        with self.Session() as session:
+            statement = select(func.nextval(sequence)).select_from(
+                func.generate_series(1, count)
+            )
+            return list(session.execute(statement).scalars().all())
+
+    def bulk_write(
+        self,
+        inserts: List[Dict[str, Any]],
+        updates: List[Tuple[int, Dict[str, Any]]],
+    ):
+        """
+        Insert and update many request records in a single transaction.
+
+        Args:
+            inserts: column values for new records, each including its reserved id
+            updates: (id, values) pairs, applied in order after the inserts so
+                later values win
+        """
+        if not inserts and not updates:
+            return
+
+        with self.Session() as session:
+            if inserts:
+                session.execute(insert(self.model), inserts)
+            for id_, values in updates:
+                session.execute(
+                    update(self.model).where(self.model.id == id_).values(**values)
+                )
+            session.commit()
+
     def delete_by_bridge_id(self, bridge_id: int):
         """Delete all request records for a specific bridge."""
         with self.Session() as session:
@@ -292,6 +376,33 @@ class RoomBridgeMappingRepository(BaseRepository):
                 session.refresh(obj)
                 return obj
 
+    def bulk_upsert(self, mappings: List[Tuple[str, int]]):
+        """
+        Create or update many room-bridge mappings in a single statement.
+        Updates bridge_id and last_seen_at for rooms that already have a mapping.
+
+        Args:
+            mappings: (room_id, bridge_id) pairs, later pairs win for repeated rooms
+        """
+        # ON CONFLICT can't touch the same row twice in one statement
+        rows = {room_id: bridge_id for room_id, bridge_id in mappings}
+        if not rows:
+            return
+
+        statement = pg_insert(self.model).values(
+            [{"room_id": r, "bridge_id": b} for r, b in rows.items()]
+        )
+        statement = statement.on_conflict_do_update(
+            index_elements=[self.model.room_id],
+            set_={
+                "bridge_id": statement.excluded.bridge_id,
+                "last_seen_at": func.now(),
+            },
+        )
+        with self.Session() as session:
+            session.execute(statement)
+            session.commit()
+
     def delete_by_bridge_id(self, bridge_id: int):
         """Delete all room-bridge mappings for a specific bridge."""
         with self.Session() as session:
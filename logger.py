@@ -1,4 +1,9 @@
+import atexit
 import logging
+import logging.handlers
+import os
+import queue
+from typing import Optional
 
 import colorlog
 
@@ -8,10 +13,45 @@ import colorlog
 # color logs would be nice
 
 
+class _FileQueueHandler(logging.handlers.QueueHandler):
+    """Queue handler that tags each record with the log file it belongs in"""
+
+    def __init__(self, log_queue, log_file: str):
+        super().__init__(log_queue)
+        self.log_file = log_file
+
+    def prepare(self, record):
+        record = super().prepare(record)
+        record.log_file = self.log_file
+        return record
+
+
+class _FileRouter(logging.Handler):
+    """Runs on the listener thread, writes each record to the file it was tagged with"""
+
+    def __init__(self):
+        super().__init__()
+        self.file_handlers = {}
+
+    def emit(self, record):
+        file_handler = self.file_handlers.get(getattr(record, "log_file", None))
+        if file_handler is not None:
+            file_handler.handle(record)
+
+
 class Logger:
 
     _instances = {}
 
+    # records are handed to one queue and written by a single listener thread, so the
+    # calling code (e.g. request handlers) never blocks on stdout or the log files.
+    # Each log file has its own queue handler, keyed by the file's absolute path
+    _queue = None
+    _listener = None
+    _file_router = None
+    _formatter = None
+    _queue_handlers = {}
+
     def __new__(cls, *args, **kwargs):
         """
         Returned existing logger class if already initialised
@@ -23,8 +63,9 @@ class Logger:
             cls._instances[cls] = super(Logger, cls).__new__(cls)
         return cls._instances[cls]
 
-    def __init__(self, file: str = "./logs.txt", level: str = "DEBUG"):
-        self.file = file
+    def __init__(self, file: Optional[str] = None, level: str = "DEBUG"):
+        # LOG_FILE moves the default log file, e.g. out of the working tree for tests
+        self.file = file or os.environ.get("LOG_FILE", "./logs.txt")
         self.level = level
 
     def get_logger(self, name: str) -> logging.Logger:
@@ -41,30 +82,73 @@ class Logger:
         # create logger
         logger = logging.getLogger(name)
 
-        # create formatter
-        formatter = colorlog.ColoredFormatter(
-            "%(log_color)s[%(asctime)s] %(levelname)s [%(name)s.%(funcName)s:%(lineno)d] %(message)s",
-            datefmt="%Y-%m-%d %H:%M:%S,%f",
-            log_colors={
-                "DEBUG": "cyan",
-                "INFO": "green",
-                "WARNING": "yellow",
-                "ERROR": "red",
-                "CRITICAL": "bold_red",
-            },
-        )
-
-        # create and add handlers
-        stdout_handler = logging.StreamHandler()
-        stdout_handler.setFormatter(formatter)
-        logger.addHandler(stdout_handler)
-
-        file_handler = logging.FileHandler(filename=self.file)
-        file_handler.setFormatter(formatter)
-        logger.addHandler(file_handler)
+        # add the queue handler shared by loggers writing to the same file
+        logger.addHandler(self._get_queue_handler())
 
         logger.setLevel(self.level)
 
         self._instances[name] = logger
 
         return logger
+
+    def _get_queue_handler(self) -> logging.handlers.QueueHandler:
+        """
+        Returns the queue handler shared by all loggers writing to this logger's file,
+        adding the file to the listener (started on first use) if it's new.
+        """
+
+        path = os.path.abspath(self.file)
+        if path in Logger._queue_handlers:
+            return Logger._queue_handlers[path]
+
+        if Logger._listener is None:
+            Logger._start_listener()
+
+        # only written to by the listener thread
+        file_handler = logging.FileHandler(filename=path)
+        file_handler.setFormatter(Logger._formatter)
+        Logger._file_router.file_handlers[path] = file_handler
+
+        queue_handler = _FileQueueHandler(Logger._queue, path)
+        Logger._queue_handlers[path] = queue_handler
+        return queue_handler
+
+    @classmethod
+    def _start_listener(cls) -> None:
+        """Start the listener thread that owns the stdout and file handlers"""
+
+        if cls._queue is None:
+            # create formatter
+            cls._formatter = colorlog.ColoredFormatter(
+                "%(log_color)s[%(asctime)s] %(levelname)s [%(name)s.%(funcName)s:%(lineno)d] %(message)s",
+                datefmt="%Y-%m-%d %H:%M:%S,%f",
+                log_colors={
+                    "DEBUG": "cyan",
+                    "INFO": "green",
+                    "WARNING": "yellow",
+                    "ERROR": "red",
+                    "CRITICAL": "bold_red",
+                },
+            )
+            cls._queue = queue.SimpleQueue()
+            cls._file_router = _FileRouter()
+
+        stdout_handler = logging.StreamHandler()
+        stdout_handler.setFormatter(cls._formatter)
+
+        cls._listener = logging.handlers.QueueListener(
+            cls._queue, stdout_handler, cls._file_router
+        )
+        cls._listener.start()
+        # flush anything still queued when the process exits
+        atexit.register(cls.stop_listener)
+
+    @classmethod
+    def stop_listener(cls) -> None:
+        """
+        Write out everything still queued and stop the listener thread. Safe to call
+        more than once, the listener is restarted if a new log file is added later.
+        """
+        if cls._listener is not None:
+            cls._listener.stop()
+            cls._listener = None
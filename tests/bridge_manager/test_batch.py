@@ -0,0 +1,102 @@
+# are malformed batches answered with 400s rather than failing the whole call
+# does a homeserver error reach the caller with its own status and errcode
+import asyncio
+from types import SimpleNamespace
+
+import orjson
+import pytest
+
+from bridge_manager.appservice import common_handlers
+from bridge_manager.appservice.common_handlers import MatrixClientAPIHandlers
+from bridge_manager.appservice.homeserver_service import HomeserverRequestError
+from bridge_manager.appservice.models import RequestContext
+
+
+class _Bridge:
+    def __init__(self, error):
+        self.error = error
+
+    async def handle_request(self, sub_ctx):
+        raise self.error
+
+
+def make_context(body_json, bridge=None):
+    # built without __init__, which logs the request to the database
+    request_ctx = RequestContext.__new__(RequestContext)
+    request_ctx.body_json = body_json
+    request_ctx.bridge = bridge
+    request_ctx.headers = {"authorization": "Bearer astok"}
+    return request_ctx
+
+
+def run_batch(body_json, bridge=None):
+    response = asyncio.run(
+        MatrixClientAPIHandlers.batch(make_context(body_json, bridge), homeserver=None)
+    )
+    return response.status_code, orjson.loads(response.body)
+
+
+@pytest.mark.parametrize("body_json", [None, [], "requests", 3])
+def test_non_object_body_is_rejected(body_json):
+    status, _ = run_batch(body_json)
+    assert status == 400
+
+
+@pytest.mark.parametrize("method", [["GET"], {"m": "GET"}, 1, "PATCH"])
+def test_invalid_method_is_a_per_item_400(method):
+    status, body = run_batch(
+        {
+            "requests": [
+                {"id": "a", "method": method, "url": "_matrix/client/versions"},
+                ["not", "an", "object"],
+            ]
+        }
+    )
+    assert status == 200
+    assert [(r["id"], r["status"]) for r in body["responses"]] == [
+        ("a", 400),
+        (None, 400),
+    ]
+
+
+def test_homeserver_error_status_and_errcode_pass_through(monkeypatch):
+    monkeypatch.setattr(
+        RequestContext,
+        "derive",
+        classmethod(lambda cls, parent, **kwargs: SimpleNamespace(**kwargs)),
+    )
+    error = HomeserverRequestError(
+        403, {"errcode": "M_FORBIDDEN", "error": "Not in room"}
+    )
+
+    result = asyncio.run(
+        common_handlers._run_batch_item(
+            make_context({}, _Bridge(error)),
+            {},
+            {"id": "s", "method": "GET", "url": "_matrix/client/v3/rooms/!r:hs/state"},
+        )
+    )
+
+    assert result == {
+        "id": "s",
+        "status": 403,
+        "body": {"errcode": "M_FORBIDDEN", "error": "Not in room"},
+    }
+
+
+def test_other_failures_are_502(monkeypatch):
+    monkeypatch.setattr(
+        RequestContext,
+        "derive",
+        classmethod(lambda cls, parent, **kwargs: SimpleNamespace(**kwargs)),
+    )
+
+    result = asyncio.run(
+        common_handlers._run_batch_item(
+            make_context({}, _Bridge(RuntimeError("connection reset"))),
+            {},
+            {"id": "s", "url": "_matrix/client/versions"},
+        )
+    )
+
+    assert result["status"] == 502
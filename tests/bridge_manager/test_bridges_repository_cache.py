@@ -0,0 +1,61 @@
+from bridge_manager.database import repositories
+from bridge_manager.database.repositories import BridgesRepository
+
+
+class _Result:
+    def __init__(self, row):
+        self.row = row
+
+    def scalar_one_or_none(self):
+        return self.row
+
+
+class _Session:
+    def __init__(self, factory):
+        self.factory = factory
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+    def execute(self, statement):
+        self.factory.queries += 1
+        return _Result(self.factory.row)
+
+
+class _SessionFactory:
+    def __init__(self, row):
+        self.row = row
+        self.queries = 0
+
+    def __call__(self):
+        return _Session(self)
+
+
+def test_cached_bridge_is_reused_until_it_expires(monkeypatch):
+    now = [1000.0]
+    monkeypatch.setattr(repositories.time, "monotonic", lambda: now[0])
+    factory = _SessionFactory(row="bridge-1")
+    repo = BridgesRepository(session_factory=factory)
+
+    assert repo.get_by_as_token("tok") == "bridge-1"
+    assert repo.get_by_as_token("tok") == "bridge-1"
+    assert factory.queries == 1
+
+    # changed by another process, seen once the cached row expires
+    factory.row = "bridge-2"
+    now[0] += repositories._BRIDGE_CACHE_TTL + 1
+    assert repo.get_by_as_token("tok") == "bridge-2"
+    assert factory.queries == 2
+
+
+def test_clear_cache_forces_a_lookup():
+    factory = _SessionFactory(row="bridge-1")
+    repo = BridgesRepository(session_factory=factory)
+
+    repo.get_by_orchestrator_id("orch")
+    repo.clear_cache()
+    repo.get_by_orchestrator_id("orch")
+    assert factory.queries == 2
@@ -0,0 +1,73 @@
+# is the bridge manager username in a users query translated back to the bridge's own
+# does the query reach the bridge with its hs_token and without the inbound host header
+import asyncio
+from types import SimpleNamespace
+
+import httpx
+
+from bridge_manager.appservice.bridge_service import (
+    BridgeService,
+    WhatsappBridgeService,
+)
+from bridge_manager.appservice.homeserver_service import HomeserverService
+from bridge_manager.appservice.models import RequestContext
+from bridge_manager.config import BridgeManagerConfig
+
+config = BridgeManagerConfig()
+
+
+def make_context(path, bridge):
+    # built without __init__, which logs the request to the database
+    request_ctx = RequestContext.__new__(RequestContext)
+    request_ctx.request_id = 1
+    request_ctx.request = SimpleNamespace(method="GET")
+    request_ctx.bridge_manager_config = config
+    request_ctx.bridge = bridge
+    request_ctx.homeserver = SimpleNamespace(name="hs", hs_token="hstok")
+    request_ctx.headers = {"host": "bridge-manager", "authorization": "Bearer x"}
+    request_ctx.path = path
+    request_ctx.path_match = config.username_in_path_re.match(path)
+    return request_ctx
+
+
+def test_users_forwards_plain_username_to_bridge():
+
+    sent = []
+
+    def handler(request):
+        sent.append(request)
+        return httpx.Response(200, json={})
+
+    # only the attributes send_request uses, a real one loads the bridge from the database
+    bridge = WhatsappBridgeService.__new__(WhatsappBridgeService)
+    bridge.bridge_url = "http://bridge:29318"
+
+    request_ctx = make_context(
+        "_matrix/app/v1/users/@_bridge_manager__whatsapp_1__bob:hs", bridge
+    )
+
+    async def run():
+        client = httpx.AsyncClient(transport=httpx.MockTransport(handler))
+        previous, BridgeService._client = BridgeService._client, client
+        try:
+            return await HomeserverService(config).users(request_ctx)
+        finally:
+            BridgeService._client = previous
+            await client.aclose()
+
+    response = asyncio.run(run())
+
+    assert response.status_code == 200
+    (request,) = sent
+    assert request.url.raw_path == b"/_matrix/app/v1/users/%40bob%3Ahs"
+    assert request.headers["authorization"] == "Bearer hstok"
+    assert request.headers["host"] == "bridge:29318"
+
+
+def test_users_rejects_path_without_bridge_manager_username():
+
+    request_ctx = make_context("_matrix/app/v1/users/@bob:hs", bridge=None)
+
+    response = asyncio.run(HomeserverService(config).users(request_ctx))
+
+    assert response.status_code == 400
@@ -0,0 +1,63 @@
+# is an upload streamed to the homeserver with its length rather than chunked
+import asyncio
+from types import SimpleNamespace
+
+import httpx
+
+from bridge_manager.appservice.common_handlers import MatrixClientAPIHandlers
+from bridge_manager.appservice.homeserver_service import HomeserverService
+from bridge_manager.appservice.models import RequestContext
+from bridge_manager.config import BridgeManagerConfig
+
+config = BridgeManagerConfig()
+
+BODY = b"\x89PNG" + b"\x00" * 1000
+
+
+def make_context():
+    async def stream():
+        yield BODY[:500]
+        yield BODY[500:]
+
+    # built without __init__, which logs the request to the database
+    request_ctx = RequestContext.__new__(RequestContext)
+    request_ctx.request_id = 1
+    request_ctx.request = SimpleNamespace(method="POST", stream=stream)
+    request_ctx.homeserver = SimpleNamespace(url="http://synapse:8008")
+    request_ctx.headers = {
+        "host": "bridge-manager",
+        "content-type": "image/png",
+        "content-length": str(len(BODY)),
+    }
+    request_ctx.path = "_matrix/media/v3/upload"
+    request_ctx.query_params = {"filename": "a.png"}
+    return request_ctx
+
+
+def test_media_upload_forwards_content_length():
+
+    sent = []
+
+    async def handler(request):
+        sent.append((request, await request.aread()))
+        return httpx.Response(200, json={"content_uri": "mxc://hs/abc"})
+
+    async def run():
+        client = httpx.AsyncClient(transport=httpx.MockTransport(handler))
+        previous, HomeserverService._client = HomeserverService._client, client
+        try:
+            return await MatrixClientAPIHandlers.media_upload(
+                make_context(), HomeserverService(config)
+            )
+        finally:
+            HomeserverService._client = previous
+            await client.aclose()
+
+    response = asyncio.run(run())
+
+    assert response.status_code == 200
+    ((request, body),) = sent
+    assert body == BODY
+    assert request.headers["content-length"] == str(len(BODY))
+    assert "transfer-encoding" not in request.headers
+    assert request.headers["host"] == "synapse:8008"
@@ -0,0 +1,33 @@
+# does the table-driven encoder match urllib.parse.quote(safe="")
+import random
+from urllib.parse import quote
+
+import pytest
+
+from bridge_manager.appservice.homeserver_service import _quote_segment
+
+
+@pytest.mark.parametrize(
+    "value",
+    [
+        "",
+        "@alice:matrix.localhost.me",
+        "@_bridge_manager__whatsapp_1__bob:hs",
+        "a/b?c#d%e f+g&h=i",
+        "-._~",
+        "ünïcødé",
+        "😀 emoji",
+        "".join(map(chr, range(128))),
+    ],
+)
+def test_matches_urllib_quote(value):
+    assert _quote_segment(value) == quote(value, safe="")
+
+
+def test_matches_urllib_quote_random():
+
+    rng = random.Random(0)
+    alphabet = [chr(c) for c in range(0x250)] + ["😀", "中", " "]
+    for _ in range(1000):
+        value = "".join(rng.choice(alphabet) for _ in range(rng.randint(0, 40)))
+        assert _quote_segment(value) == quote(value, safe=""), repr(value)
@@ -0,0 +1,138 @@
+# do exact routes win over everything else
+# does the first registered of overlapping regex/prefix routes win
+# does the fallback only apply when nothing matches
+# does the indexed lookup agree with matching every route in order
+import random
+
+import pytest
+
+from bridge_manager.appservice.route_registry import (
+    RouteMatchType,
+    RouteNotFoundError,
+    RouteRegistry,
+)
+
+
+def handler(name):
+    async def _handler(request_ctx):
+        return name
+
+    _handler.__name__ = name
+    return _handler
+
+
+def ordered_match(registry, path):
+    """Reference behaviour: exact routes first, then every route in registration order"""
+    routes = registry.get_routes()
+    for route in routes:
+        if route.match_type == RouteMatchType.EXACT and route.matches(path):
+            return route.handler
+    for route in routes:
+        if route.match_type != RouteMatchType.EXACT and route.matches(path):
+            return route.handler
+    return None
+
+
+def test_exact_beats_earlier_prefix_and_regex():
+
+    registry = RouteRegistry()
+    prefix, regex, exact = handler("prefix"), handler("regex"), handler("exact")
+    registry.add_prefix("_matrix/client/", prefix)
+    registry.add_regex(r"_matrix/client/.*", regex)
+    registry.add_exact("_matrix/client/versions", exact)
+
+    assert registry.match("_matrix/client/versions") is exact
+    assert registry.match("_matrix/client/v3/sync") is prefix
+
+
+@pytest.mark.parametrize("regex_first", [True, False])
+def test_first_registered_of_regex_and_prefix_wins(regex_first):
+
+    registry = RouteRegistry()
+    prefix, regex = handler("prefix"), handler("regex")
+    if regex_first:
+        registry.add_regex(r"_matrix/client/v3/rooms/[^/]+/send/", regex)
+        registry.add_prefix("_matrix/client/v3/rooms/", prefix)
+    else:
+        registry.add_prefix("_matrix/client/v3/rooms/", prefix)
+        registry.add_regex(r"_matrix/client/v3/rooms/[^/]+/send/", regex)
+
+    path = "_matrix/client/v3/rooms/!a:hs/send/m.room.message/1"
+    assert registry.match(path) is (regex if regex_first else prefix)
+    # only the prefix matches here either way
+    assert registry.match("_matrix/client/v3/rooms/!a:hs/state") is prefix
+
+
+def test_first_registered_of_overlapping_prefixes_wins():
+
+    registry = RouteRegistry()
+    short, long = handler("short"), handler("long")
+    registry.add_prefix("_matrix/", short)
+    registry.add_prefix("_matrix/client/", long)
+
+    assert registry.match("_matrix/client/versions") is short
+
+
+def test_duplicate_registration_keeps_the_first():
+
+    registry = RouteRegistry()
+    first, second = handler("first"), handler("second")
+    registry.add_exact("_matrix/client/versions", first)
+    registry.add_exact("_matrix/client/versions", second)
+    registry.add_prefix("_matrix/media/", first)
+    registry.add_prefix("_matrix/media/", second)
+
+    assert registry.match("_matrix/client/versions") is first
+    assert registry.match("_matrix/media/v3/config") is first
+
+
+def test_fallback():
+
+    fallback = handler("fallback")
+    registry = RouteRegistry(fallback_handler=fallback)
+    versions = handler("versions")
+    registry.add_exact("_matrix/client/versions", versions)
+
+    assert registry.match("_matrix/client/v3/sync") is None
+    assert registry.match_or_fallback("_matrix/client/v3/sync") is fallback
+    assert registry.match_or_fallback("_matrix/client/versions") is versions
+
+    with pytest.raises(RouteNotFoundError):
+        RouteRegistry().match_or_fallback("_matrix/client/v3/sync")
+
+
+def test_remove_pattern_reindexes():
+
+    registry = RouteRegistry()
+    regex, prefix = handler("regex"), handler("prefix")
+    registry.add_regex(r"_matrix/client/v3/.*", regex)
+    registry.add_prefix("_matrix/client/", prefix)
+
+    assert registry.remove_pattern(r"_matrix/client/v3/.*")
+    assert registry.match("_matrix/client/v3/sync") is prefix
+    assert not registry.remove_pattern(r"_matrix/client/v3/.*")
+
+
+def test_matches_ordered_reference():
+
+    rng = random.Random(0)
+    segments = ["_matrix", "client", "v3", "rooms", "sync", "media", "a", "b"]
+
+    def random_path():
+        return "/".join(rng.choice(segments) for _ in range(rng.randint(1, 5)))
+
+    for _ in range(200):
+        registry = RouteRegistry()
+        for i in range(rng.randint(1, 12)):
+            kind = rng.choice(["exact", "prefix", "regex"])
+            pattern = random_path()
+            if kind == "exact":
+                registry.add_exact(pattern, handler(f"h{i}"))
+            elif kind == "prefix":
+                registry.add_prefix(pattern[: rng.randint(1, len(pattern))], handler(f"h{i}"))
+            else:
+                registry.add_regex(pattern.replace(rng.choice(segments), "[^/]+"), handler(f"h{i}"))
+
+        for _ in range(20):
+            path = random_path()
+            assert registry.match(path) is ordered_match(registry, path), path
@@ -0,0 +1,125 @@
+# are items flushed in batches no bigger than max_batch
+# can items be queued from a worker thread
+# does stopping flush the in-flight batch and anything still queued
+# is a backlog flushed without waiting `interval` between batches
+# are items dropped, not blocked on, once the queue is full
+import asyncio
+import threading
+
+from bridge_manager.appservice.write_behind import WriteBehindQueue
+
+
+def test_batches_respect_max_batch():
+
+    flushed = []
+
+    async def run():
+        queue = WriteBehindQueue(flushed.append, name="test", max_batch=3, interval=0)
+        for i in range(7):
+            queue.put(i)
+        queue.start()
+        await queue.stop()
+
+    asyncio.run(run())
+
+    assert all(len(batch) <= 3 for batch in flushed), "Batch exceeded max_batch"
+    assert [i for batch in flushed for i in batch] == list(range(7))
+
+
+def test_put_from_worker_thread():
+
+    flushed = []
+
+    async def run():
+        queue = WriteBehindQueue(flushed.append, name="test", interval=0)
+        queue.start()
+
+        threads = [
+            threading.Thread(target=lambda n=n: [queue.put((n, i)) for i in range(50)])
+            for n in range(4)
+        ]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            await asyncio.to_thread(thread.join)
+
+        await queue.stop()
+
+    asyncio.run(run())
+
+    items = [item for batch in flushed for item in batch]
+    assert sorted(items) == [(n, i) for n in range(4) for i in range(50)]
+
+
+def test_stop_flushes_in_flight_and_queued_items():
+
+    flushed = []
+    flush_started = threading.Event()
+    release_flush = threading.Event()
+
+    def slow_flush(batch):
+        # only the first flush blocks
+        if not flush_started.is_set():
+            flush_started.set()
+            release_flush.wait(timeout=5)
+        flushed.append(batch)
+
+    async def run():
+        queue = WriteBehindQueue(slow_flush, name="test", interval=60)
+        queue.start()
+        queue.put("in-flight")
+        await asyncio.to_thread(flush_started.wait, 5)
+
+        # queued while the writer is busy flushing
+        queue.put("queued")
+
+        stopping = asyncio.create_task(queue.stop())
+        await asyncio.sleep(0.05)
+        assert not stopping.done(), "stop() didn't wait for the in-flight flush"
+        release_flush.set()
+        await stopping
+
+        # nothing may still be flushing once stop() returns
+        assert [item for batch in flushed for item in batch] == ["in-flight", "queued"]
+
+    asyncio.run(run())
+
+
+def test_backlog_is_flushed_without_waiting_interval():
+
+    flushed = []
+
+    async def run():
+        queue = WriteBehindQueue(flushed.append, name="test", max_batch=10, interval=60)
+        queue.start()
+        for i in range(100):
+            queue.put(i)
+
+        # ten batches, far less than one interval
+        for _ in range(200):
+            if sum(map(len, flushed)) == 100:
+                break
+            await asyncio.sleep(0.01)
+        assert sum(map(len, flushed)) == 100, "Writer waited between queued batches"
+
+        await queue.stop()
+
+    asyncio.run(run())
+
+
+def test_full_queue_drops_items():
+
+    flushed = []
+
+    async def run():
+        queue = WriteBehindQueue(flushed.append, name="test", maxsize=3)
+        for i in range(5):
+            queue.put(i)
+        assert queue.dropped == 2
+
+        queue.start()
+        await queue.stop()
+
+    asyncio.run(run())
+
+    assert [i for batch in flushed for i in batch] == [0, 1, 2]
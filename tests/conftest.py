@@ -0,0 +1,18 @@
+import os
+import tempfile
+
+import pytest
+
+# keep test logs out of the working tree, set before any module creates its logger
+os.environ.setdefault(
+    "LOG_FILE", os.path.join(tempfile.gettempdir(), "augment_chat_tests_logs.txt")
+)
+
+from logger import Logger
+
+
+@pytest.fixture(scope="session", autouse=True)
+def stop_log_listener():
+    yield
+    # flushed while pytest still captures output, rather than at interpreter exit
+    Logger.stop_listener()